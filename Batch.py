@@ -0,0 +1,105 @@
+import multiprocessing
+import os
+
+from Module.DB import *
+from Device_Router.LayoutProcess import Preprocess
+from Device_Router.RouteMetrics import RouteMetrics
+from Device_Router.RouteOptions import RouteOptions
+from Device_Router.Router import maze_routing_iter
+from Device_Router.TechRules import tech_rules, share_rules
+
+# state of the worker process (loaded once by the pool initializer, only in the pool workers)
+_worker = {}
+
+
+def _worker_state(techs: list, routing_layers: int, stop_on_failure: bool, options: RouteOptions=None) -> dict:
+    """
+    @brief      The state routing the candidates: the technologies and their preprocess
+    """
+    return {"techs": techs,
+            "routes": [Preprocess(tech) for tech in techs],
+            "routing_layers": routing_layers,
+            "stop_on_failure": stop_on_failure,
+            "options": options}
+
+
+def _init_worker(techs: list, rules: list, routing_layers: int, stop_on_failure: bool, options: RouteOptions=None) -> None:
+    """
+    @brief      Load the technologies and their design rules once per worker
+    """
+    for tech, tech_rule in zip(techs, rules):
+        share_rules(tech, tech_rule)
+
+    _worker.update(_worker_state(techs, routing_layers, stop_on_failure, options))
+
+
+def _route_candidate(task: tuple, worker: dict=None) -> tuple:
+    """
+    @brief      Route one placement candidate in the worker
+    @param      task    (candidate index, technology index, circuit)
+    @param      worker  The state routing the candidate (default: the state of the worker process)
+    @return     (candidate index, batch result of the candidate)
+    """
+    index, tech_idx, circuit = task
+    worker = worker if worker is not None else _worker
+    metrics = RouteMetrics()
+
+    failed = []
+    for name, result in maze_routing_iter(worker["techs"][tech_idx], circuit, worker["routing_layers"], metrics,
+                                          route=worker["routes"][tech_idx], options=worker["options"]):
+        if not result["success"]:
+            failed.append(name)
+            # abandon the candidate at the first failed net
+            if worker["stop_on_failure"]:
+                break
+
+    return index, {"routing": circuit.group["routing"],
+                   "success": not failed,
+                   "failed": failed,
+                   "metrics": metrics.report()}
+
+
+def route_batch(candidates: list, routing_layers: int, processes: int=None, stop_on_failure: bool=False,
+                options: RouteOptions=None) -> list:
+    """
+    @brief      Route many placement candidates in a process pool
+    @param      candidates      The list of (Tech, Circuit) candidates
+    @param      routing_layers  The routing layers of maze_routing
+    @param      processes       The number of worker processes (default: all cores, 1: in this process)
+    @param      stop_on_failure Stop routing a candidate at its first failed net (its routing is then partial)
+    @param      options         The routing options (optional), e.g. a raster cache directory shared by the workers
+    @return     The result of each candidate (in order): the routing group, success, failed nets and metrics
+
+    The distinct Tech objects and their rule tables are sent to each worker once, when the
+    pool starts, so only the circuits are sent with each candidate.
+    As with maze_routing, the routing group is also set in each candidate circuit.
+    """
+    # distinct technologies of the candidates
+    techs = []
+    tasks = []
+    for index, (tech, circuit) in enumerate(candidates):
+        tech_idx = next((i for i, t in enumerate(techs) if t is tech), None)
+        if tech_idx is None:
+            techs.append(tech)
+            tech_idx = len(techs) - 1
+        tasks.append((index, tech_idx, circuit))
+
+    rules = [tech_rules(tech) for tech in techs]
+
+    processes = processes or os.cpu_count() or 1
+    processes = min(processes, len(tasks)) if tasks else 1
+
+    results = [None] * len(tasks)
+    if processes == 1:
+        # route in this process (no pickling, the rules are already those of the techs)
+        worker = _worker_state(techs, routing_layers, stop_on_failure, options)
+        for task in tasks:
+            index, result = _route_candidate(task, worker)
+            results[index] = result
+    else:
+        with multiprocessing.Pool(processes, initializer=_init_worker, initargs=(techs, rules, routing_layers, stop_on_failure, options)) as pool:
+            for index, result in pool.imap_unordered(_route_candidate, tasks, chunksize=1):
+                results[index] = result
+                candidates[index][1].group["routing"] = result["routing"]
+
+    return results
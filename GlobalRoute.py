@@ -0,0 +1,164 @@
+from Device_Router.GridGraph import GridGraph
+import heapq
+import math
+import numpy as np
+
+
+class Corridor:
+    """
+    GCells and layer range a net is routed in: the detailed search only expands the nodes inside.
+    """
+    def __init__(self, size: float, cells: set, z0: int, z1: int) -> None:
+        self.size = size
+        self.cells = cells          # (gcell x, gcell y)
+        self.z0 = z0
+        self.z1 = z1
+
+
+    def __contains__(self, node) -> bool:
+        return self.z0 <= node.z <= self.z1 and (math.floor(node.x / self.size), math.floor(node.y / self.size)) in self.cells
+
+
+class GlobalRouter:
+    """
+    Global routing of the nets of a circuit on coarse GCells (squares of the same size for all the
+    nets, in user units). Each net gets a corridor of GCells connecting its pin groups, found on
+    the free space of its grid and the congestion of the nets already routed; the congestion
+    is the number of routed nets through each GCell.
+    """
+    def __init__(self, size: float, margin: int=1, layers_above: int=2, blocked_cost: float=4.0, congestion_cost: float=1.0) -> None:
+        """
+        @param      size             The GCell size in user units
+        @param      margin           The GCells around the global route added to the corridor
+        @param      layers_above     The routing layers above the highest pin layer in the corridor
+        @param      blocked_cost     The cost of a fully blocked (but not obstructed) GCell, on top of 1
+        @param      congestion_cost  The cost of each net already routed through a GCell
+        """
+        self.size = size
+        self.margin = margin
+        self.layers_above = layers_above
+        self.blocked_cost = blocked_cost
+        self.congestion_cost = congestion_cost
+        self.demand = {}            # (gcell x, gcell y) -> number of routed nets
+
+
+    def free_space(self, graph: GridGraph, z0: int, z1: int) -> tuple:
+        """
+        The fraction of free nodes of each GCell of a grid (layers z0 to z1), from the obstacle maps
+        of the blockage (before grid_connections).
+        @return     The first GCell (x, y) and the (rows x columns) array of free fractions
+        """
+        x0, x1, y0, y1 = graph.extent()
+        cx0, cy0 = math.floor(x0 / self.size), math.floor(y0 / self.size)
+        shape = (math.floor(y1 / self.size) - cy0 + 1, math.floor(x1 / self.size) - cx0 + 1)
+        nodes = np.zeros(shape)
+        free = np.zeros(shape)
+
+        for z in range(z0, z1 + 1):
+            if z in graph.blockage:
+                xs, ys, obstacle, _ = graph.blockage[z]
+            else:
+                lay = graph.grid3d[z]
+                xs, ys, obstacle = [node.x for node in lay[0]], [row[0].y for row in lay], None
+
+            ix = np.floor(np.array(xs, dtype=float) / self.size).astype(int) - cx0
+            iy = np.floor(np.array(ys, dtype=float) / self.size).astype(int) - cy0
+            count = np.zeros(shape)
+            np.add.at(count, (iy[:, None], ix[None, :]), 1)
+            nodes += count
+            if obstacle is not None:
+                np.add.at(count, (iy[:, None], ix[None, :]), -np.asarray(obstacle, dtype=float))
+            free += count
+
+        return (cx0, cy0), np.divide(free, nodes, out=np.zeros(shape), where=nodes > 0)
+
+
+    def corridor(self, graph: GridGraph, points: list) -> Corridor:
+        """
+        The corridor of a net on its grid (after the blockage, before grid_connections).
+        @param      points  The points to route of each pin group of the net
+        @return     The corridor, or None if the pin groups are not connected on the GCells
+        """
+        z0 = min([pt[2] for group in points for pt in group])
+        z1 = min(max([pt[2] for group in points for pt in group]) + self.layers_above, graph.total_layers - 1)
+        (cx0, cy0), free = self.free_space(graph, z0, z1)
+        rows, cols = free.shape
+
+        groups = [set([(math.floor(pt[0] / self.size), math.floor(pt[1] / self.size)) for pt in group]) for group in points]
+        pins = set().union(*groups)
+
+        def cost(cell: tuple) -> float:
+            f = free[cell[1] - cy0, cell[0] - cx0]
+            if f <= 0 and cell not in pins:
+                return None
+            return 1 + self.blocked_cost * (1 - f) + self.congestion_cost * self.demand.get(cell, 0)
+
+        # connect the pin groups one by one to the GCells already connected (shortest paths)
+        cells = set(groups[0])
+        remaining = groups[1:]
+        while remaining:
+            targets = {}
+            for i, group in enumerate(remaining):
+                for cell in group:
+                    targets.setdefault(cell, i)
+
+            dist = {cell: 0.0 for cell in cells}
+            prev = {}
+            heap = [(0.0, cell) for cell in sorted(cells)]
+            found = None
+            while heap:
+                d, cell = heapq.heappop(heap)
+                if d > dist[cell]:
+                    continue
+                if cell in targets:
+                    found = cell
+                    break
+                for nxt in ((cell[0]+1, cell[1]), (cell[0]-1, cell[1]), (cell[0], cell[1]+1), (cell[0], cell[1]-1)):
+                    if not (0 <= nxt[0] - cx0 < cols and 0 <= nxt[1] - cy0 < rows):
+                        continue
+                    c = cost(nxt)
+                    if c is not None and d + c < dist.get(nxt, float("inf")):
+                        dist[nxt] = d + c
+                        prev[nxt] = cell
+                        heapq.heappush(heap, (d + c, nxt))
+
+            if found is None:
+                return None
+
+            group = remaining.pop(targets[found])
+            cells |= group
+            while found in prev:
+                cells.add(found)
+                found = prev[found]
+
+        # corridor: the global route and the GCells around it
+        corridor = set()
+        for cx, cy in cells:
+            for dx in range(-self.margin, self.margin + 1):
+                for dy in range(-self.margin, self.margin + 1):
+                    corridor.add((cx + dx, cy + dy))
+
+        return Corridor(self.size, corridor, z0, z1)
+
+
+    def add_paths(self, paths: list) -> None:
+        """
+        Add a routed net (its paths of grid nodes) to the congestion of the GCells.
+        """
+        cells = set([(math.floor(node.x / self.size), math.floor(node.y / self.size)) for path in paths for node in path])
+        for cell in cells:
+            self.demand[cell] = self.demand.get(cell, 0) + 1
+
+
+    def add_trimmed_paths(self, paths: list) -> None:
+        """
+        Add a routed net (its trimmed paths of [x, y, z] points, e.g. mirrored) to the congestion of the GCells.
+        """
+        cells = set()
+        for path in paths:
+            for pt1, pt2 in zip(path, path[1:] + path[-1:]):
+                cx0, cx1 = sorted([math.floor(pt1[0] / self.size), math.floor(pt2[0] / self.size)])
+                cy0, cy1 = sorted([math.floor(pt1[1] / self.size), math.floor(pt2[1] / self.size)])
+                cells.update([(cx, cy) for cx in range(cx0, cx1 + 1) for cy in range(cy0, cy1 + 1)])
+        for cell in cells:
+            self.demand[cell] = self.demand.get(cell, 0) + 1
@@ -1,7 +1,40 @@
 from Module.DB import *
+from Device_Router.TechRules import tech_rules
+from Device_Router.SearchBudget import BudgetExceeded
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
 import numpy as np
 import matplotlib.pyplot as plt
 
+def rasterize_rects(xs: list, ys: list, obstacle: np.ndarray, vertical_block: np.ndarray, rects: list,
+                    row0: int=0, col0: int=0) -> None:
+    """
+    Mark rectangles (bounds included) on the obstacle and vertical block maps of a grid, in order.
+    The rows and columns inside each rectangle are found by bisection of the sorted grid axes.
+    @param      xs              The sorted x-coordinates of the grid columns
+    @param      ys              The sorted y-coordinates of the grid rows
+    @param      obstacle        The obstacle map (rows x columns), or a window of it
+    @param      vertical_block  The vertical block map, same shape as obstacle
+    @param      rects           The list of (x0, x1, y0, y1, obstacle, vertical_block) (None: keep)
+    @param      row0            The first row of the window in the grid
+    @param      col0            The first column of the window in the grid
+    """
+    rows, cols = obstacle.shape
+    for x0, x1, y0, y1, obs, vb in rects:
+        r0 = max(bisect_left(ys, y0) - row0, 0)
+        r1 = min(bisect_right(ys, y1) - row0, rows)
+        c0 = max(bisect_left(xs, x0) - col0, 0)
+        c1 = min(bisect_right(xs, x1) - col0, cols)
+        if r0 >= r1 or c0 >= c1:
+            continue
+
+        if obs is not None:
+            obstacle[r0:r1, c0:c1] = obs
+        if vb is not None:
+            vertical_block[r0:r1, c0:c1] = vb
+
+
 class GridNode:
     def __init__(self, x: int, y: int, z: int) -> None:
         # x, y and z coordinates
@@ -20,8 +53,6 @@ class GridNode:
         # obstacle
         self.obstacle = False
         self.vertical_block = False
-        self.visited = False
-        self.step = None
 
     def get_neighbors(self) -> list:
         neighbors = []
@@ -44,47 +75,27 @@ class GridNode:
 
 
 class GridGraph:
-    def __init__(self, tech: Tech, layers: int=7) -> None:
+    def __init__(self, tech: Tech, layers: int=7, directions: dict=None) -> None:
+        """
+        @param      directions  The only planar direction ("horizontal" or "vertical") of the moves on
+                                each layer index (the layers not in it have both directions)
+        """
         self.tech = tech
         self.grid3d = []
         self.total_layers = layers      # include poly (index: 0)
+        self.directions = directions if directions is not None else {}
+        self.blockage = {}              # obstacle/vertical block maps of the layers (mark_rects)
+        self.pending = {}               # rectangles of the layers not rasterized yet
         self.get_design_rule(tech)
 
 
     def get_design_rule(self, tech: Tech) -> None:
-        self.pitch = []
-        self.rt_layer2int = {}
-        self.int2rt_layer = {}
-        self.via_layer2int = {}
-        self.int2via_layer = {}
-
-        for layer_idx in range(self.total_layers):
-            # poly layer
-            if layer_idx == 0:
-                min_width = tech.min_width_rule["poly"]
-                min_spacing = tech.min_spacing_rule[("poly","poly")]
-
-                self.rt_layer2int["poly"] = layer_idx
-                self.int2rt_layer[layer_idx] = "poly"
-                self.via_layer2int["contact"] = layer_idx
-                self.int2via_layer[layer_idx] = "contact"
-
-            # metal layer
-            else:
-                # check the min width and min spacing exist
-                if "metal"+str(layer_idx) not in tech.min_width_rule or ("metal"+str(layer_idx),"metal"+str(layer_idx)) not in tech.min_spacing_rule:
-                    print("Error: metal"+str(layer_idx)+" min width or min spacing is not defined.")
-                    exit(1)
-
-                min_width = tech.min_width_rule["metal"+str(layer_idx)]
-                min_spacing = tech.min_spacing_rule[("metal"+str(layer_idx),"metal"+str(layer_idx))]
-                self.rt_layer2int["metal"+str(layer_idx)] = layer_idx
-                self.int2rt_layer[layer_idx] = "metal"+str(layer_idx)
-                if layer_idx < self.total_layers:
-                    self.via_layer2int["via"+str(layer_idx)+str(layer_idx+1)] = layer_idx
-                    self.int2via_layer[layer_idx] = "via"+str(layer_idx)+str(layer_idx+1)
-
-            self.pitch.append((min_width + min_spacing)/tech.unit["user"])
+        rules = tech_rules(tech, self.total_layers)
+        self.rt_layer2int = rules.rt_layer2int
+        self.int2rt_layer = rules.int2rt_layer
+        self.via_layer2int = rules.via_layer2int
+        self.int2via_layer = rules.int2via_layer
+        self.pitch = list(rules.pitch_user)
 
         
     def create_grid_graph(self, nets: list, pitch_adjust: int) -> None:
@@ -184,6 +195,160 @@ class GridGraph:
                     self.grid3d[m].insert(next_row_index, curr_row)  # insert the new row
 
 
+    def mark_rects(self, z: int, rects: list) -> None:
+        """
+        Mark the nodes of a layer inside rectangles (bounds included), in the order of the rectangles.
+        The rectangles are rasterized on the obstacle/vertical block maps of the layer by rasterize,
+        and the maps are applied to the nodes by grid_connections.
+        @param      z      The layer index
+        @param      rects  The list of (x0, x1, y0, y1, obstacle, vertical_block), where obstacle and
+                           vertical_block are the values to set (None to keep the current value)
+        """
+        if not rects:
+            return
+
+        self.pending.setdefault(z, []).extend(rects)
+
+
+    def rasterize(self) -> None:
+        """
+        Rasterize the rectangles marked since the last call on the maps of their layers.
+        """
+        pending = self.pending
+        self.pending = {}
+        for z in pending:
+            self.rasterize_layer(z, pending[z])
+
+
+    def rasterize_layer(self, z: int, rects: list) -> None:
+        if z not in self.blockage:
+            # maps of the layer from the current state of the nodes
+            lay = self.grid3d[z]
+            xs = [node.x for node in lay[0]]
+            ys = [row[0].y for row in lay]
+            obstacle = np.array([[node.obstacle for node in row] for row in lay], dtype=bool)
+            vertical_block = np.array([[node.vertical_block for node in row] for row in lay], dtype=bool)
+            self.blockage[z] = (xs, ys, obstacle, vertical_block)
+
+        xs, ys, obstacle, vertical_block = self.blockage[z]
+        rasterize_rects(xs, ys, obstacle, vertical_block, rects)
+
+
+    def apply_blockage(self) -> None:
+        """
+        Set the obstacle and vertical block of the nodes from the maps of mark_rects.
+        """
+        self.rasterize()
+        for z in self.blockage:
+            _, _, obstacle, vertical_block = self.blockage[z]
+            for row, obs_row, vb_row in zip(self.grid3d[z], obstacle.tolist(), vertical_block.tolist()):
+                for node, obs, vb in zip(row, obs_row, vb_row):
+                    node.obstacle = obs
+                    node.vertical_block = vb
+        self.blockage = {}
+
+
+    def set_directions(self, directions: dict) -> None:
+        """
+        Set the preferred direction of each layer index (the grid is then connected again with
+        grid_connections, the obstacles are kept).
+        """
+        self.directions = directions
+
+
+    def block_vertical(self, node: GridNode) -> None:
+        """
+        Block the vertical routing of a node (after the grid connection).
+        """
+        node.vertical_block = True
+
+
+    def search_space(self):
+        """
+        The grid to pass to the search functions.
+        """
+        return self.grid3d
+
+
+    def extent(self) -> tuple:
+        """
+        The (x0, x1, y0, y1) bounds of the nodes of all the layers.
+        """
+        return (min([lay[0][0].x for lay in self.grid3d]), max([lay[0][-1].x for lay in self.grid3d]),
+                min([lay[0][0].y for lay in self.grid3d]), max([lay[-1][0].y for lay in self.grid3d]))
+
+
+    def node_count(self) -> int:
+        return sum([len(row) for lay in self.grid3d for row in lay])
+
+
+    def connected_components(self, nodes: list=None) -> dict:
+        """
+        Label the connected components of the free space (all layers), using the same moves as the search.
+        The components are weakly connected (a move in either direction connects two nodes), so two nodes
+        in different components can never be connected by a path.
+        @param      nodes  The nodes to return the label of (all free nodes if None)
+        @return     The component label of each node (obstacle nodes are not labelled)
+        """
+        # planar components of each layer (the planar links are symmetric)
+        label = {}
+        count = 0
+        for lay in self.grid3d:
+            for row in lay:
+                for node in row:
+                    if node.obstacle or node in label:
+                        continue
+
+                    label[node] = count
+                    queue = [node]
+                    for curr in queue:
+                        for neighbor in (curr.up, curr.down, curr.left, curr.right):
+                            if neighbor is not None and not neighbor.obstacle and neighbor not in label:
+                                label[neighbor] = count
+                                queue.append(neighbor)
+                    count += 1
+
+        # merge the planar components connected by a vertical move
+        parent = list(range(count))
+
+        def find(x):
+            while parent[x] != x:
+                parent[x] = parent[parent[x]]
+                x = parent[x]
+            return x
+
+        for node in label:
+            if node.vertical_block:
+                continue
+            for neighbor in (node.top, node.bottom):
+                if neighbor is not None and not neighbor.obstacle:
+                    root_x = find(label[node])
+                    root_y = find(label[neighbor])
+                    if root_x != root_y:
+                        parent[root_y] = root_x
+
+        nodes = label if nodes is None else [node for node in nodes if node in label]
+        return {node: find(label[node]) for node in nodes}
+
+
+    def check_routability(self, netlist: list) -> bool:
+        """
+        Check that all the pin nodes of a net (all groups) are in the same free-space component.
+        @param      netlist  The pin nodes of each pin group
+        @return     False if the net can not be routed on this grid
+        """
+        nodes = list(dict.fromkeys([node for pins in netlist for node in pins]))
+        if len(nodes) <= 1:
+            return True
+
+        # blocked pins can not be reached
+        if any(node.obstacle for node in nodes):
+            return False
+
+        component = self.connected_components(nodes)
+        return len(set(component.values())) == 1
+
+
     def get_grid_node(self, coor: tuple) -> GridNode:
         for row in self.grid3d[coor[2]]:
             for node in row:
@@ -192,8 +357,11 @@ class GridGraph:
 
 
     def grid_connections(self) -> None:
+        self.apply_blockage()
+
         # connect the nodes
         for lay in range(len(self.grid3d)):
+            direction = self.directions.get(lay)
             for row in range(len(self.grid3d[lay])):
                 for col in range(len(self.grid3d[lay][row])):
                     # get the current node
@@ -203,32 +371,37 @@ class GridGraph:
                     if curr_node.obstacle:
                         continue
 
-                    # connect the nodes in the x-y plane
+                    # connect the nodes in the x-y plane: in the preferred direction of the layer, or
+                    # in both directions from/to a node with a vertical block (no via to leave it)
+                    free_vertical = direction != "horizontal" or curr_node.vertical_block
+                    free_horizontal = direction != "vertical" or curr_node.vertical_block
                     if row > 0:
                         up_node: GridNode = self.grid3d[lay][row-1][col]
-                        curr_node.up = up_node if not up_node.obstacle else None
+                        curr_node.up = up_node if not up_node.obstacle and (free_vertical or up_node.vertical_block) else None
                     if row < len(self.grid3d[lay])-1:
                         down_node: GridNode = self.grid3d[lay][row+1][col]
-                        curr_node.down = down_node if not down_node.obstacle else None
+                        curr_node.down = down_node if not down_node.obstacle and (free_vertical or down_node.vertical_block) else None
                     if col > 0:
                         left_node: GridNode = self.grid3d[lay][row][col-1]
-                        curr_node.left = left_node if not left_node.obstacle else None
+                        curr_node.left = left_node if not left_node.obstacle and (free_horizontal or left_node.vertical_block) else None
                     if col < len(self.grid3d[lay][row])-1:
                         right_node: GridNode = self.grid3d[lay][row][col+1]
-                        curr_node.right = right_node if not right_node.obstacle else None
+                        curr_node.right = right_node if not right_node.obstacle and (free_horizontal or right_node.vertical_block) else None
 
                     # connect the nodes in the z-axis
                     if lay > 0:
                         bottom_node: GridNode = self.grid3d[lay-1][row][col]
                         if not bottom_node.obstacle and not curr_node.vertical_block and curr_node.x == bottom_node.x and curr_node.y == bottom_node.y:
                             curr_node.bottom = bottom_node
-                    if lay < 6:
+                    if lay < len(self.grid3d)-1:
                         top_node: GridNode = self.grid3d[lay+1][row][col]
                         if not top_node.obstacle and not curr_node.vertical_block and curr_node.x == top_node.x and curr_node.y == top_node.y:
                             curr_node.top = top_node
 
 
     def plot_grid(self, circuit: Circuit, nets: list, paths: list=[], mrange: tuple=(0,2), title: str=""):
+        self.apply_blockage()
+
         # shape layout
         for m in range(mrange[0], mrange[1]+1, 1):
             layer = self.int2rt_layer[m]
@@ -374,3 +547,396 @@ class GridGraph:
         plt.show()
         # plt.savefig(circuit.name+"_"+title+".png")
 
+
+class TiledGridNode(GridNode):
+    """
+    Handle of a node of a TiledGridGraph. The state of the node is stored in the tile of the graph,
+    two handles of the same node are equal.
+    """
+    def __init__(self, graph, z: int, row: int, col: int) -> None:
+        self.graph = graph
+        self.z = z
+        self.row = row
+        self.col = col
+        self.x = graph.xs[z][col]
+        self.y = graph.ys[z][row]
+
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, TiledGridNode) and self.z == other.z and self.row == other.row and self.col == other.col
+
+
+    def __hash__(self) -> int:
+        return hash((self.z, self.row, self.col))
+
+
+    @property
+    def obstacle(self) -> bool:
+        tile, i = self.graph.cell(self.z, self.row, self.col)
+        return bool(tile["obstacle"][i])
+
+
+    @property
+    def vertical_block(self) -> bool:
+        tile, i = self.graph.cell(self.z, self.row, self.col)
+        return bool(tile["vertical_block"][i])
+
+
+    @vertical_block.setter
+    def vertical_block(self, value: bool) -> None:
+        self.graph.block_vertical(self, value)
+
+
+    def get_neighbors(self) -> list:
+        return self.graph.get_neighbors(self)
+
+
+class TiledGridGraph(GridGraph):
+    """
+    Grid graph of a net stored as tiles of compact node state, allocated when a node of the tile
+    is first accessed (blockage is replayed on the tile) and evicted when the memory budget is
+    exceeded. An evicted tile is rebuilt the same when it is accessed again, and the search state
+    is kept out of the tiles (search_state), so the search gives the same result as on a GridGraph
+    with the same nodes and blockage.
+    """
+    def __init__(self, tech: Tech, layers: int=7, memory_budget: int=64*2**20, tile_size: int=64, directions: dict=None) -> None:
+        """
+        @param      memory_budget  The memory (bytes) of the tiles above which the unused tiles are evicted
+        @param      tile_size      The number of rows and columns of a tile
+        @param      directions     The only planar direction of the moves on each layer index
+        """
+        super().__init__(tech, layers, directions)
+        self.memory_budget = memory_budget
+        self.tile_size = tile_size
+
+        # grid axes of each layer, and if each row/column was inserted for an unaligned point
+        self.xs = []
+        self.ys = []
+        self.x_inserted = []
+        self.y_inserted = []
+
+        # blockage rectangles of each layer, and the pin nodes with a vertical block
+        self.rects = []
+        self.blocked_vertical = set()
+
+        # tiles (least recently used first)
+        self.tiles = OrderedDict()
+        self.memory = 0             # tiles and search state
+        self.state_memory = 0       # search state (TileState), not evicted
+        self.peak_memory = 0
+        self.cells_allocated = 0
+
+
+    def create_grid_graph(self, nets: list, pitch_adjust: int) -> None:
+        # flatten the nets
+        flatten_nets = []
+        for net in nets:
+            flatten_nets += net
+
+        # find the boundary of the nets
+        x0 = min([pt[0] for pt in flatten_nets])
+        x1 = max([pt[0] for pt in flatten_nets])
+        y0 = min([pt[1] for pt in flatten_nets])
+        y1 = max([pt[1] for pt in flatten_nets])
+
+        # same axes as the nodes of GridGraph.create_grid_graph
+        for m in range(self.total_layers):
+            num_grid_extend = 5
+            grid_pitch = self.pitch[m] / pitch_adjust
+
+            br_x0 = x0 - num_grid_extend * grid_pitch
+            br_x1 = x1 + num_grid_extend * grid_pitch
+            br_y0 = y0 - num_grid_extend * grid_pitch
+            br_y1 = y1 + num_grid_extend * grid_pitch
+
+            self.xs.append(list(np.arange(br_x0, br_x1, grid_pitch)))
+            self.ys.append(list(np.arange(br_y0, br_y1, grid_pitch)))
+            self.x_inserted.append([False] * len(self.xs[m]))
+            self.y_inserted.append([False] * len(self.ys[m]))
+            self.rects.append([])
+
+        self.extend_grid_node(flatten_nets)
+
+
+    def extend_grid_node(self, flatten_nets: list) -> None:
+        # insert the columns/rows of the unaligned points (at the same index in all layers)
+        for pt in flatten_nets:
+            if pt[0] not in self.xs[pt[2]]:
+                for i, x in enumerate(self.xs[pt[2]]):
+                    if x < pt[0]:
+                        prev_index = i
+                    if x > pt[0]:
+                        next_index = i
+                        break
+
+                for m in range(self.total_layers):
+                    self.xs[m].insert(next_index, pt[0])
+                    self.x_inserted[m].insert(next_index, True)
+
+            if pt[1] not in self.ys[pt[2]]:
+                for i, y in enumerate(self.ys[pt[2]]):
+                    if y < pt[1]:
+                        prev_index = i
+                    if y > pt[1]:
+                        next_index = i
+                        break
+
+                for m in range(self.total_layers):
+                    self.ys[m].insert(next_index, pt[1])
+                    self.y_inserted[m].insert(next_index, True)
+
+
+    def mark_rects(self, z: int, rects: list) -> None:
+        self.rects[z] += rects
+
+        # tiles already allocated
+        for key in self.tiles:
+            if key[0] == z:
+                self.apply_rects(self.tiles[key], rects)
+
+
+    def apply_rects(self, tile: dict, rects: list) -> None:
+        # 2D views of the tile state
+        obstacle = np.frombuffer(tile["obstacle"], dtype=bool).reshape(tile["height"], tile["width"])
+        vertical_block = np.frombuffer(tile["vertical_block"], dtype=bool).reshape(tile["height"], tile["width"])
+        rasterize_rects(self.xs[tile["z"]], self.ys[tile["z"]], obstacle, vertical_block, rects, tile["row"], tile["col"])
+
+
+    def load_tile(self, key: tuple) -> dict:
+        z, tr, tc = key
+        r0 = tr * self.tile_size
+        c0 = tc * self.tile_size
+        h = min(self.tile_size, len(self.ys[z]) - r0)
+        w = min(self.tile_size, len(self.xs[z]) - c0)
+
+        tile = {"z": z, "row": r0, "col": c0, "height": h, "width": w, "size": h * w,
+                "obstacle": bytearray(h * w), "vertical_block": bytearray(h * w)}
+
+        # vertical block of the inserted rows and columns
+        x_inserted = self.x_inserted[z][c0:c0+w]
+        for row in range(h):
+            if self.y_inserted[z][r0 + row]:
+                tile["vertical_block"][row*w:(row+1)*w] = b"\x01" * w
+            else:
+                tile["vertical_block"][row*w:(row+1)*w] = bytes(x_inserted)
+
+        # replay the blockage
+        self.apply_rects(tile, self.rects[z])
+        for bz, row, col in self.blocked_vertical:
+            if bz == z and r0 <= row < r0 + h and c0 <= col < c0 + w:
+                tile["vertical_block"][(row - r0) * w + col - c0] = 1
+
+        self.tiles[key] = tile
+        self.memory += 2 * tile["size"]
+        self.cells_allocated += tile["size"]
+        self.evict(keep=key)
+        self.check_budget()
+        self.peak_memory = max(self.peak_memory, self.memory)
+
+        return tile
+
+
+    def evict(self, keep: tuple=None) -> None:
+        # evict the least recently used tiles (except the tile in use)
+        if self.memory <= self.memory_budget:
+            return
+
+        for key in list(self.tiles):
+            tile = self.tiles[key]
+            if key != keep:
+                del self.tiles[key]
+                self.memory -= 2 * tile["size"]
+                if self.memory <= self.memory_budget:
+                    break
+
+
+    def check_budget(self) -> None:
+        # the search state can not be evicted: the search is stopped if it does not fit with the tile in use
+        if self.memory > self.memory_budget and self.state_memory > 0:
+            raise BudgetExceeded("tile memory budget exceeded by the search state ({} bytes)".format(self.state_memory))
+
+
+    def reserve_state(self, size: int, keep: tuple) -> None:
+        """
+        Count the memory of new search state (bytes) in the memory budget, evicting the unused tiles.
+        Raise BudgetExceeded if the search state does not fit in the memory budget.
+        @param      keep  The key of the tile in use
+        """
+        self.memory += size
+        self.state_memory += size
+        self.evict(keep)
+        try:
+            self.check_budget()
+        except BudgetExceeded:
+            self.memory -= size
+            self.state_memory -= size
+            raise
+        self.peak_memory = max(self.peak_memory, self.memory)
+
+
+    def release_state(self, size: int) -> None:
+        """
+        Free the memory of search state (bytes) counted by reserve_state.
+        """
+        self.memory -= size
+        self.state_memory -= size
+
+
+    def cell(self, z: int, row: int, col: int) -> tuple:
+        """
+        The tile of a node (allocated if needed) and the index of the node in the tile.
+        """
+        key = (z, row // self.tile_size, col // self.tile_size)
+        tile = self.tiles.get(key)
+        if tile is None:
+            tile = self.load_tile(key)
+        else:
+            self.tiles.move_to_end(key)
+
+        return tile, (row - tile["row"]) * tile["width"] + col - tile["col"]
+
+
+    def is_obstacle(self, z: int, row: int, col: int) -> bool:
+        tile, i = self.cell(z, row, col)
+        return tile["obstacle"][i] == 1
+
+
+    def get_neighbors(self, node: TiledGridNode) -> list:
+        # same neighbors (and order) as GridNode.get_neighbors after grid_connections
+        z, row, col = node.z, node.row, node.col
+        tile, i = self.cell(z, row, col)
+        if tile["obstacle"][i]:
+            return []
+        vertical_block = tile["vertical_block"][i]
+
+        neighbors = []
+        rows = len(self.ys[z])
+        cols = len(self.xs[z])
+        direction = self.directions.get(z)
+        for r, c in ((row-1, col), (row+1, col), (row, col-1), (row, col+1)):
+            if 0 <= r < rows and 0 <= c < cols and not self.is_obstacle(z, r, c):
+                # wrong-way moves only from/to a node with a vertical block (as GridGraph.grid_connections)
+                if (r != row and direction == "horizontal") or (c != col and direction == "vertical"):
+                    if not self.connection_block(z, row, col) and not self.connection_block(z, r, c):
+                        continue
+                neighbors.append(TiledGridNode(self, z, r, c))
+
+        if not vertical_block:
+            for lay in (z+1, z-1):
+                if 0 <= lay < self.total_layers and row < len(self.ys[lay]) and col < len(self.xs[lay]) \
+                   and self.xs[lay][col] == node.x and self.ys[lay][row] == node.y and not self.is_obstacle(lay, row, col):
+                    neighbors.append(TiledGridNode(self, lay, row, col))
+
+        return neighbors
+
+
+    def block_vertical(self, node: TiledGridNode, value: bool=True) -> None:
+        tile, i = self.cell(node.z, node.row, node.col)
+        # the nodes blocked after the blockage (replayed when their tile is loaded again)
+        if value and not tile["vertical_block"][i]:
+            self.blocked_vertical.add((node.z, node.row, node.col))
+        elif not value:
+            self.blocked_vertical.discard((node.z, node.row, node.col))
+        tile["vertical_block"][i] = value
+
+
+    def connection_block(self, z: int, row: int, col: int) -> bool:
+        """
+        The vertical block of a node before the pins are blocked (when GridGraph connects the nodes).
+        """
+        tile, i = self.cell(z, row, col)
+        return tile["vertical_block"][i] == 1 and (z, row, col) not in self.blocked_vertical
+
+
+    def search_state(self, typecode: str) -> "TileState":
+        """
+        Per-search values of the nodes (see SearchContext), stored per tile outside the tiles and
+        counted in the memory budget until released.
+        """
+        return TileState(self, typecode)
+
+
+    def search_space(self):
+        return self
+
+
+    def extent(self) -> tuple:
+        return (min([xs[0] for xs in self.xs]), max([xs[-1] for xs in self.xs]),
+                min([ys[0] for ys in self.ys]), max([ys[-1] for ys in self.ys]))
+
+
+    def node_count(self) -> int:
+        # nodes of the tiles allocated so far
+        return self.cells_allocated
+
+
+    def check_routability(self, netlist: list) -> bool:
+        # the labeling would allocate every tile of the grid: not checked (route_net skips the precheck)
+        return True
+
+
+    def get_grid_node(self, coor: tuple) -> TiledGridNode:
+        z = coor[2]
+        col = bisect_left(self.xs[z], coor[0])
+        row = bisect_left(self.ys[z], coor[1])
+        if col < len(self.xs[z]) and row < len(self.ys[z]) and self.xs[z][col] == coor[0] and self.ys[z][row] == coor[1]:
+            return TiledGridNode(self, z, row, col)
+
+
+    def grid_connections(self) -> None:
+        # the neighbors are found from the tiles when the node is expanded
+        pass
+
+
+class TileState:
+    """
+    Values of the nodes of a TiledGridGraph in one search (a step count, or a visited flag), with
+    the dict/set interface of the search. The values are stored as one compact array per tile
+    reached by the search, -1 for the nodes without a value. The arrays are counted in the memory
+    budget of the graph (the tiles of the grid are evicted for them) until release.
+    """
+    def __init__(self, graph: TiledGridGraph, typecode: str="i") -> None:
+        self.graph = graph
+        self.typecode = typecode
+        self.tiles = {}
+        self.memory = 0
+
+
+    def slot(self, node: TiledGridNode, create: bool) -> tuple:
+        size = self.graph.tile_size
+        key = (node.z, node.row // size, node.col // size)
+        values = self.tiles.get(key)
+        if values is None and create:
+            nbytes = array(self.typecode).itemsize * size * size
+            self.graph.reserve_state(nbytes, key)
+            values = array(self.typecode, [-1]) * (size * size)
+            self.tiles[key] = values
+            self.memory += nbytes
+        return values, (node.row % size) * size + node.col % size
+
+
+    def release(self) -> None:
+        self.graph.release_state(self.memory)
+        self.tiles = {}
+        self.memory = 0
+
+
+    def __contains__(self, node: TiledGridNode) -> bool:
+        values, i = self.slot(node, False)
+        return values is not None and values[i] >= 0
+
+
+    def __getitem__(self, node: TiledGridNode) -> int:
+        values, i = self.slot(node, False)
+        if values is None or values[i] < 0:
+            raise KeyError(node)
+        return values[i]
+
+
+    def __setitem__(self, node: TiledGridNode, value: int) -> None:
+        values, i = self.slot(node, True)
+        values[i] = value
+
+
+    def add(self, node: TiledGridNode) -> None:
+        self[node] = 0
@@ -1,86 +1,50 @@
 from Module.DB import *
 from Device_Router.GridGraph import GridGraph
-from Device_Generator.engineering_notation import EngNumber as eng
-import math
+from Device_Router.SpatialIndex import ShapeIndex
+from Device_Router.NetIndex import NetIndex, access_points
+from Device_Router.TechRules import TechRules, tech_rules, ROUTE_LAYERS, ROUTE_VIA
+from Device_Router.RouteMetrics import logger
+import heapq
+import numpy as np
 
 class Preprocess:
     def __init__(self, tech: Tech, total_layers: int=7) -> None:
         self.total_layers = total_layers
+        self.tables = None              # (rules, layout tables) of path_layout
         self.get_design_rule(tech)
 
     def get_design_rule(self, tech: Tech) -> None:
-        self.pitch = []
-        self.rt_layer2int = {}
-        self.int2rt_layer = {}
-        self.via_layer2int = {}
-        self.int2via_layer = {}
-
-        for layer_idx in range(self.total_layers):
-            if layer_idx == 0:
-                min_width = tech.min_width_rule["poly"]
-                min_spacing = tech.min_spacing_rule[("poly","poly")]
-
-                self.rt_layer2int["poly"] = layer_idx
-                self.int2rt_layer[layer_idx] = "poly"
-                self.via_layer2int["contact"] = layer_idx
-                self.int2via_layer[layer_idx] = "contact"
-
-            else:
-                # check the min width and min spacing exist
-                if "metal"+str(layer_idx) not in tech.min_width_rule or ("metal"+str(layer_idx),"metal"+str(layer_idx)) not in tech.min_spacing_rule:
-                    print("Error: metal"+str(layer_idx)+" min width or min spacing is not defined.")
-                    exit(1)
-
-                min_width = tech.min_width_rule["metal"+str(layer_idx)]
-                min_spacing = tech.min_spacing_rule[("metal"+str(layer_idx),"metal"+str(layer_idx))]
-                self.rt_layer2int["metal"+str(layer_idx)] = layer_idx
-                self.int2rt_layer[layer_idx] = "metal"+str(layer_idx)
-                if layer_idx < self.total_layers:
-                    self.via_layer2int["via"+str(layer_idx)+str(layer_idx+1)] = layer_idx
-                    self.int2via_layer[layer_idx] = "via"+str(layer_idx)+str(layer_idx+1)
-
-            self.pitch.append(min_width + min_spacing)
-
-
-    def pin_port_grouping2(self, circuit: Circuit) -> dict:
+        self.rules = tech_rules(tech, self.total_layers)
+        self.rt_layer2int = self.rules.rt_layer2int
+        self.int2rt_layer = self.rules.int2rt_layer
+        self.via_layer2int = self.rules.via_layer2int
+        self.int2via_layer = self.rules.int2via_layer
+        self.pitch = list(self.rules.pitch)
+
+
+    def pin_port_grouping2(self, circuit: Circuit, nets: NetIndex=None) -> dict:
         """
         Combine the circuit's ports and the group's pins together into the same net dictionary,
         because the ports are the input/output of the circuit, and the pins are the internal connections of the group,
         and they need to be connected together to form a net.
+        The pins of each net are taken from the net index of the circuit (built if not given).
         """
-        # get pin and port from circuit
-        nets = {}
-
-        # append the port into the nets (with the name)
-        for name in circuit.port:
-            if "metal1" in circuit.port[name].shape:
-                m1_shape = circuit.port[name].shape["metal1"]
-
-                pt1 = [m1_shape[0].x[0], m1_shape[0].y[0]]
-                pt2 = [m1_shape[0].x[1], m1_shape[0].y[1]]
-                nets[name] = [Pin(name, "metal1", pt1, pt2)]
-
-        # append the pin from the group into the nets (with the name)
-        for inst in circuit.group:
-            # pin in the group
-            for pin in circuit.group[inst].pin:
-                if pin.net in nets:
-                    nets[pin.net].append(pin)
-                else:
-                    nets[pin.net] = [pin]
+        nets = nets if nets is not None else NetIndex(circuit, self.rules)
 
         # group
         group_nets = {}
-        for name in nets:
-            group_nets[name] = self.find_groups(nets[name])
+        net_pins = nets.net_pins()
+        for name in net_pins:
+            group_nets[name] = self.find_groups(net_pins[name])
             
         return group_nets            
 
 
-    def pin_port_find_points2(self, tech: Tech, group_nets: dict) -> dict:
+    def pin_port_find_points2(self, tech: Tech, group_nets: dict, nets: NetIndex=None) -> dict:
         """
         Find the points to route the net from the pin and port dictionary.
         Use the points to generate grid graph for routing later.
+        The points of the pins in the net index (if given) are already computed.
         """
         # get the point to route
         routing_net = {}
@@ -90,7 +54,7 @@ class Preprocess:
             for net in group_nets[name]:
                 points = []
                 for pin in net:
-                    point = self.get_pin_points(tech, pin)
+                    point = nets.pin_points(pin) if nets is not None else self.get_pin_points(tech, pin)
                     points += point
                     pin.grid = point
                     
@@ -126,10 +90,23 @@ class Preprocess:
             if root_x != root_y:
                 parent[root_y] = root_x
 
+        # sweep the pins of each layer along x: a pin interacts with the active pins
+        # (started before it and not ended) overlapping or touching it in y
+        layers = {}
         for i in range(n):
-            for j in range(i+1, n):
-                if self.check_interaction(nets[i], nets[j]):
-                    union(i, j)
+            layers.setdefault(nets[i].layer, []).append(i)
+
+        for pins in layers.values():
+            active = []     # heap of (x1, index)
+            for j in sorted(pins, key=lambda k: (nets[k].pt1[0], k)):
+                while active and active[0][0] < nets[j].pt1[0]:
+                    heapq.heappop(active)
+
+                for _, i in active:
+                    if nets[i].pt1[1] <= nets[j].pt2[1] and nets[i].pt2[1] >= nets[j].pt1[1]:
+                        union(i, j)
+
+                heapq.heappush(active, (nets[j].pt2[0], j))
 
         groups = {}
         for i in range(n):
@@ -142,237 +119,166 @@ class Preprocess:
 
 
     def get_pin_points(self, tech: Tech, pin: Pin) -> list:
-        z = self.rt_layer2int[pin.layer]
-        route_hw = tech.min_width_rule[pin.layer] / 2
-        points = []
-
-        # get the four end points
-        x0 = round(pin.pt1[0]/tech.unit["user"]) + int(route_hw/tech.unit["user"])
-        x1 = round(pin.pt2[0]/tech.unit["user"]) - int(route_hw/tech.unit["user"])
-        y0 = round(pin.pt1[1]/tech.unit["user"]) + int(route_hw/tech.unit["user"])
-        y1 = round(pin.pt2[1]/tech.unit["user"]) - int(route_hw/tech.unit["user"])
-
-        # single end point
-        if x0 == x1 and y0 == y1:
-            points.append((x0, y0, z))
-        else:
-            # vertical pin (two end points)
-            if x0 == x1:
-                points.append((x0, y0, z))
-                points.append((x0, y1, z))
-            # horizontal pin (two end points)
-            elif y0 == y1:
-                points.append((x0, y0, z))
-                points.append((x1, y0, z))
-            # four end points
-            else:
-                points.append((x0, y0, z))
-                points.append((x1, y1, z))
-                points.append((x0, y1, z))
-                points.append((x1, y0, z))
-
-        return points
+        unit = tech.unit["user"]
+        rect = (round(pin.pt1[0]/unit), round(pin.pt2[0]/unit), round(pin.pt1[1]/unit), round(pin.pt2[1]/unit))
+        return access_points(rect, self.rt_layer2int[pin.layer], self.rules.half_width[pin.layer])
     
 
-    def diffusion_blockage(self, tech: Tech, circuit: Circuit, graph: GridGraph):
-        print("   >> Diffusion Blockage")
+    def diffusion_blockage(self, tech: Tech, circuit: Circuit, graph: GridGraph, index: ShapeIndex=None):
+        logger.debug("   >> Diffusion Blockage")
+        index = index if index is not None else ShapeIndex(tech, circuit)
+        window = graph.extent()
+        rects = []
+
         # find the diffusion blockage
+        rules = tech_rules(tech, self.total_layers)
         for diff_layer in ["ndiffusion", "pdiffusion"]:
             # design rules
-            df_spc_po = int(tech.min_spacing_rule[(diff_layer,"poly")]/tech.unit["user"])
-            # po_hw = int(tech.min_width_rule["poly"]/2 /tech.unit["user"])                                                 # poly width
-            po_hw = int((tech.min_size_rule["contact"] + tech.min_enclosure_rule["poly","contact"])/2 /tech.unit["user"])   # poly-cut width
+            df_spc_po = rules.diffusion_spacing[diff_layer]
+            # po_hw = rules.half_width["poly"]                      # poly width
+            po_hw = rules.poly_contact_half_width                   # poly-cut width
 
-            for inst in circuit.group:
-                if diff_layer not in circuit.group[inst].shape:
-                    continue
+            # diffusion shapes near the grid
+            for _, diff in index.query("diffusion", diff_layer, window, df_spc_po + po_hw):
+                # convert box to grid unit (db -> user)
+                df_x0 = round(diff.x[0] / tech.unit["user"])
+                df_x1 = round(diff.x[1] / tech.unit["user"])
+                df_y0 = round(diff.y[0] / tech.unit["user"])
+                df_y1 = round(diff.y[1] / tech.unit["user"])
+
+                # add spacing rules
+                df_x0 = df_x0 - df_spc_po - po_hw
+                df_x1 = df_x1 + df_spc_po + po_hw
+                df_y0 = df_y0 - df_spc_po - po_hw
+                df_y1 = df_y1 + df_spc_po + po_hw
+
+                # add blockage on the poly grid
+                rects.append((df_x0, df_x1, df_y0, df_y1, True, True))
+
+        graph.mark_rects(0, rects)
+
+
+    def poly_pin_blockage2(self, tech: Tech, circuit: Circuit, graph: GridGraph, pin_name: str="", index: ShapeIndex=None):
+        logger.debug("   >> Poly Pin Blockage")
+        index = index if index is not None else ShapeIndex(tech, circuit)
+        rects = []
+
+        # design rules
+        rules = tech_rules(tech, self.total_layers)
+        po_spc_po = rules.spacing["poly"]           # poly space poly
+        po_hw = rules.half_width["poly"]            # poly half width
+        po_enc_co = rules.via_enclosure["poly"]     # poly enclosure contact
+        co_hs = rules.via_half_size["poly"]         # contact halfsize
+
+        # poly pins near the grid
+        margin = max(po_spc_po + po_hw, po_spc_po + po_enc_co + co_hs)
+        for _, pin in index.query("pin", "poly", graph.extent(), margin):
+            # convert box to grid unit (db -> user)
+            po_x0 = round(pin.pt1[0] / tech.unit["user"])
+            po_x1 = round(pin.pt2[0] / tech.unit["user"])
+            po_y0 = round(pin.pt1[1] / tech.unit["user"])
+            po_y1 = round(pin.pt2[1] / tech.unit["user"])
+
+            # add spacing rules (block in the same layer)
+            po_x0_1 = po_x0 - po_spc_po - po_hw
+            po_x1_1 = po_x1 + po_spc_po + po_hw
+            po_y0_1 = po_y0 - po_spc_po - po_hw
+            po_y1_1 = po_y1 + po_spc_po + po_hw
+
+            # add spacing rules (block to the vertical layers)
+            po_x0_2 = po_x0 - po_spc_po - po_enc_co - co_hs
+            po_x1_2 = po_x1 + po_spc_po + po_enc_co + co_hs
+            po_y0_2 = po_y0 - po_spc_po - po_enc_co - co_hs
+            po_y1_2 = po_y1 + po_spc_po + po_enc_co + co_hs
+
+            # block the poly pin
+            rects.append((po_x0_1, po_x1_1, po_y0_1, po_y1_1, True, None))
+            rects.append((po_x0_2, po_x1_2, po_y0_2, po_y1_2, None, True))
+
+            # unblock the poly points in the grid if it is the current pin
+            if pin_name == pin.net:
+                for point in pin.grid:
+                    # within the poly shape, unblock the points in the same x- or y-coordinates as the routing points
+                    if po_x0 <= point[0] <= po_x1:
+                        rects.append((point[0], point[0], po_y0_1, po_y1_1, False, None))
+                    if po_y0_1 <= point[1] <= po_y1_1:
+                        rects.append((po_x0, po_x1, point[1], point[1], False, None))
+
+        graph.mark_rects(0, rects)
+
+
+    def metal_pin_blockage(self, tech: Tech, circuit: Circuit, graph: GridGraph, pin_name: str="", index: ShapeIndex=None):
+        logger.debug("   >> Metal Pin Blockage")
+        metal_layer = {"poly": 0, "metal1": 1, "metal2": 2, "metal3": 3, "metal4": 4, "metal5": 5, "metal6": 6}
+        rules = tech_rules(tech, self.total_layers)
+        index = index if index is not None else ShapeIndex(tech, circuit)
+        window = graph.extent()
 
-                for diff in circuit.group[inst].shape[diff_layer]:
-                    # convert box to grid unit (db -> user)
-                    df_x0 = round(diff.x[0] / tech.unit["user"])
-                    df_x1 = round(diff.x[1] / tech.unit["user"])
-                    df_y0 = round(diff.y[0] / tech.unit["user"])
-                    df_y1 = round(diff.y[1] / tech.unit["user"])
+        for layer in ["metal1", "metal2", "metal3", "metal4", "metal5", "metal6"]:
+            # design rules
+            mx_spc_mx = rules.spacing[layer]
+            mx_hw = rules.half_width[layer]
+            mx_enc_vx = rules.via_enclosure[layer]
+            vx_hs = rules.via_half_size[layer]
+            margin = max(mx_spc_mx + mx_hw, mx_spc_mx + mx_enc_vx + vx_hs)
+
+            # pins (then the metal1 ports) near the grid
+            shapes = [(pin.net, pin.pt1, pin.pt2) for _, pin in index.query("pin", layer, window, margin)]
+            if layer == "metal1":
+                shapes += [(port, [shape.x[0], shape.y[0]], [shape.x[1], shape.y[1]]) for port, shape in index.query("port", layer, window, margin)]
+
+            rects = []
+            for net, pt1, pt2 in shapes:
+                # convert box to grid unit (db -> user)
+                mx_x0 = round(pt1[0] / tech.unit["user"])
+                mx_x1 = round(pt2[0] / tech.unit["user"])
+                mx_y0 = round(pt1[1] / tech.unit["user"])
+                mx_y1 = round(pt2[1] / tech.unit["user"])
 
+                # unblock the metal pin if it is the current pin
+                if pin_name == net:
+                    rects.append((mx_x0, mx_x1, mx_y0, mx_y1, False, None))
+
+                # block the metal pin if it is not the current pin
+                else:
                     # add spacing rules
-                    df_x0 = df_x0 - df_spc_po - po_hw
-                    df_x1 = df_x1 + df_spc_po + po_hw
-                    df_y0 = df_y0 - df_spc_po - po_hw
-                    df_y1 = df_y1 + df_spc_po + po_hw
-
-                    # add blockage on the poly grid
-                    for row in graph.grid3d[0]:
-                        for node in row:
-                            if node.x >= df_x0 and node.x <= df_x1 and node.y >= df_y0 and node.y <= df_y1:
-                                node.obstacle = True
-                                node.vertical_block = True
-
-
-    def poly_pin_blockage2(self, tech: Tech, circuit: Circuit, graph: GridGraph, pin_name: str=""):
-        print("   >> Poly Pin Blockage")
-        for inst in circuit.group:
-            for pin in circuit.group[inst].pin:
-                if pin.layer == "poly":
-                    # design rules
-                    po_spc_po = int(tech.min_spacing_rule[("poly","poly")]/tech.unit["user"])    # poly space poly
-                    po_hw = int(tech.min_width_rule["poly"]/2 /tech.unit["user"])                # poly half width
-                    po_enc_co = int(tech.min_enclosure_rule["poly","contact"]/tech.unit["user"]) # poly enclosure contact
-                    co_hs = int(tech.min_size_rule["contact"]/2 /tech.unit["user"])              # contact halfsize
-
-                    # convert box to grid unit (db -> user)
-                    po_x0 = round(pin.pt1[0] / tech.unit["user"])
-                    po_x1 = round(pin.pt2[0] / tech.unit["user"])
-                    po_y0 = round(pin.pt1[1] / tech.unit["user"])
-                    po_y1 = round(pin.pt2[1] / tech.unit["user"])
-
-                    # add spacing rules (block in the same layer)
-                    po_x0_1 = po_x0 - po_spc_po - po_hw
-                    po_x1_1 = po_x1 + po_spc_po + po_hw
-                    po_y0_1 = po_y0 - po_spc_po - po_hw
-                    po_y1_1 = po_y1 + po_spc_po + po_hw
-
-                    # add spacing rules (block to the vertical layers)
-                    po_x0_2 = po_x0 - po_spc_po - po_enc_co - co_hs
-                    po_x1_2 = po_x1 + po_spc_po + po_enc_co + co_hs
-                    po_y0_2 = po_y0 - po_spc_po - po_enc_co - co_hs
-                    po_y1_2 = po_y1 + po_spc_po + po_enc_co + co_hs
-
-                    # block the poly pin
-                    for row in graph.grid3d[0]:
-                        for node in row:
-                            if node.x >= po_x0_1 and node.x <= po_x1_1 and node.y >= po_y0_1 and node.y <= po_y1_1:
-                                node.obstacle = True
-
-                            if node.x >= po_x0_2 and node.x <= po_x1_2 and node.y >= po_y0_2 and node.y <= po_y1_2:
-                                node.vertical_block = True
-
-                    # unblock the poly points in the grid if it is the current pin
-                    if pin_name == pin.net:
-                        for row in graph.grid3d[0]:
-                            for node in row:
-
-                                # within the poly shape
-                                if node.x >= po_x0 and node.x <= po_x1 and node.y >= po_y0_1 and node.y <= po_y1_1:
-                                    for point in pin.grid:
-
-                                        # unblock the points in the same x-coordinates as the routing points
-                                        if node.x == point[0] or node.y == point[1]:
-                                            node.obstacle = False
-
-
-
-    def metal_pin_blockage(self, tech: Tech, circuit: Circuit, graph: GridGraph, pin_name: str=""):
-        print("   >> Metal Pin Blockage")
-        metal_layer = {"poly": 0, "metal1": 1, "metal2": 2, "metal3": 3, "metal4": 4, "metal5": 5, "metal6": 6}
-        via_layer = {0: "contact", 1: "via12", 2: "via23", 3: "via34", 4: "via45", 5: "via56", 6: "via56"}
-
-        for inst in circuit.group:
-            for pin in circuit.group[inst].pin:
-                if pin.layer in ["metal1", "metal2", "metal3", "metal4", "metal5", "metal6"]:
-                    # design rules
-                    mx_spc_mx = int(tech.min_spacing_rule[(pin.layer,pin.layer)]/tech.unit["user"])
-                    mx_hw = int(tech.min_width_rule[pin.layer]/2 /tech.unit["user"])
-                    mx_enc_vx = int(tech.min_enclosure_rule[pin.layer,via_layer[metal_layer[pin.layer]]]/tech.unit["user"])
-                    vx_hs = int(tech.min_size_rule[via_layer[metal_layer[pin.layer]]]/2 /tech.unit["user"])
-
-                    # convert box to grid unit (db -> user)
-                    mx_x0 = round(pin.pt1[0] / tech.unit["user"])
-                    mx_x1 = round(pin.pt2[0] / tech.unit["user"])
-                    mx_y0 = round(pin.pt1[1] / tech.unit["user"])
-                    mx_y1 = round(pin.pt2[1] / tech.unit["user"])
-
-                    # unblock the metal pin if it is the current pin
-                    if pin_name == pin.net:
-                        for row in graph.grid3d[metal_layer[pin.layer]]:
-                            for node in row:
-                                if node.x >= mx_x0 and node.x <= mx_x1 and node.y >= mx_y0 and node.y <= mx_y1:
-                                    node.obstacle = False
-
-                    # block the metal pin if it is not the current pin
-                    else:
-                        # add spacing rules
-                        mx_x0_1 = mx_x0 - mx_spc_mx - mx_hw
-                        mx_x1_1 = mx_x1 + mx_spc_mx + mx_hw
-                        mx_y0_1 = mx_y0 - mx_spc_mx - mx_hw
-                        mx_y1_1 = mx_y1 + mx_spc_mx + mx_hw
-
-                        # add spacing rules
-                        mx_x0_2 = mx_x0 - mx_spc_mx - mx_enc_vx - vx_hs
-                        mx_x1_2 = mx_x1 + mx_spc_mx + mx_enc_vx + vx_hs
-                        mx_y0_2 = mx_y0 - mx_spc_mx - mx_enc_vx - vx_hs
-                        mx_y1_2 = mx_y1 + mx_spc_mx + mx_enc_vx + vx_hs
-
-                        # block the metal pin
-                        for row in graph.grid3d[metal_layer[pin.layer]]:
-                            for node in row:
-                                if node.x >= mx_x0_1 and node.x <= mx_x1_1 and node.y >= mx_y0_1 and node.y <= mx_y1_1:
-                                    node.obstacle = True
-
-                                if node.x >= mx_x0_2 and node.x <= mx_x1_2 and node.y >= mx_y0_2 and node.y <= mx_y1_2:
-                                    node.vertical_block = True
-
-        for port in circuit.port:
-            if "metal1" in circuit.port[port].shape:
-                for shape in circuit.port[port].shape["metal1"]:
-                    pt1 = [shape.x[0], shape.y[0]]
-                    pt2 = [shape.x[1], shape.y[1]]
-
-                    # design rules
-                    mx_spc_mx = int(tech.min_spacing_rule[("metal1","metal1")]/tech.unit["user"])
-                    mx_hw = int(tech.min_width_rule["metal1"]/2 /tech.unit["user"])
-                    mx_enc_vx = int(tech.min_enclosure_rule["metal1","via12"]/tech.unit["user"])
-                    vx_hs = int(tech.min_size_rule["via12"]/2 /tech.unit["user"])
-
-                    # convert box to grid unit (db -> user)
-                    mx_x0 = round(pt1[0] / tech.unit["user"])
-                    mx_x1 = round(pt2[0] / tech.unit["user"])
-                    mx_y0 = round(pt1[1] / tech.unit["user"])
-                    mx_y1 = round(pt2[1] / tech.unit["user"])
-
-                    # unblock the metal pin if it is the current pin
-                    if pin_name == port:
-                        for row in graph.grid3d[metal_layer["metal1"]]:
-                            for node in row:
-                                if node.x >= mx_x0 and node.x <= mx_x1 and node.y >= mx_y0 and node.y <= mx_y1:
-                                    node.obstacle = False
-
-                    # block the metal pin if it is not the current pin
-                    else:
-                        # add spacing rules
-                        mx_x0_1 = mx_x0 - mx_spc_mx - mx_hw
-                        mx_x1_1 = mx_x1 + mx_spc_mx + mx_hw
-                        mx_y0_1 = mx_y0 - mx_spc_mx - mx_hw
-                        mx_y1_1 = mx_y1 + mx_spc_mx + mx_hw
-
-                        # add spacing rules
-                        mx_x0_2 = mx_x0 - mx_spc_mx - mx_enc_vx - vx_hs
-                        mx_x1_2 = mx_x1 + mx_spc_mx + mx_enc_vx + vx_hs
-                        mx_y0_2 = mx_y0 - mx_spc_mx - mx_enc_vx - vx_hs
-                        mx_y1_2 = mx_y1 + mx_spc_mx + mx_enc_vx + vx_hs
-
-                        # block the metal pin
-                        for row in graph.grid3d[metal_layer["metal1"]]:
-                            for node in row:
-                                if node.x >= mx_x0_1 and node.x <= mx_x1_1 and node.y >= mx_y0_1 and node.y <= mx_y1_1:
-                                    node.obstacle = True 
-
-                                if node.x >= mx_x0_2 and node.x <= mx_x1_2 and node.y >= mx_y0_2 and node.y <= mx_y1_2:
-                                    node.vertical_block = True
-
-
-    def route_path_blockage(self, tech: Tech, circuit: Circuit, graph: GridGraph):
-        print("   >> Route Path Blockage")
+                    mx_x0_1 = mx_x0 - mx_spc_mx - mx_hw
+                    mx_x1_1 = mx_x1 + mx_spc_mx + mx_hw
+                    mx_y0_1 = mx_y0 - mx_spc_mx - mx_hw
+                    mx_y1_1 = mx_y1 + mx_spc_mx + mx_hw
+
+                    # add spacing rules
+                    mx_x0_2 = mx_x0 - mx_spc_mx - mx_enc_vx - vx_hs
+                    mx_x1_2 = mx_x1 + mx_spc_mx + mx_enc_vx + vx_hs
+                    mx_y0_2 = mx_y0 - mx_spc_mx - mx_enc_vx - vx_hs
+                    mx_y1_2 = mx_y1 + mx_spc_mx + mx_enc_vx + vx_hs
+
+                    # block the metal pin
+                    rects.append((mx_x0_1, mx_x1_1, mx_y0_1, mx_y1_1, True, None))
+                    rects.append((mx_x0_2, mx_x1_2, mx_y0_2, mx_y1_2, None, True))
+
+            if rects and metal_layer[layer] < graph.total_layers:
+                graph.mark_rects(metal_layer[layer], rects)
+
+
+    def route_path_blockage(self, tech: Tech, circuit: Circuit, graph: GridGraph, index: ShapeIndex=None):
+        logger.debug("   >> Route Path Blockage")
+        index = index if index is not None else ShapeIndex(tech, circuit)
+        window = graph.extent()
         route = {"poly": 0, "metal1": 1, "metal2": 2, "metal3": 3, "metal4": 4, "metal5": 5, "metal6": 6}
-        via = {0: "contact", 1: "via12", 2: "via23", 3: "via34", 4: "via45", 5: "via56", 6: "via56"}
+        rules = tech_rules(tech, self.total_layers)
 
         for layer in route:
             # design rules
-            rt_spc_rt = int(tech.min_spacing_rule[(layer,layer)]/tech.unit["user"])
-            rt_hw = int(tech.min_width_rule[layer]/2 /tech.unit["user"])
-            rt_enc_vx = int(tech.min_enclosure_rule[layer,via[route[layer]]]/tech.unit["user"])
-            vx_hs = int(tech.min_size_rule[via[route[layer]]]/2 /tech.unit["user"])
-
-            for shp in circuit.group["routing"].shape[layer]:
+            rt_spc_rt = rules.spacing[layer]
+            rt_hw = rules.half_width[layer]
+            rt_enc_vx = rules.via_enclosure[layer]
+            vx_hs = rules.via_half_size[layer]
+
+            # routed shapes near the grid
+            margin = max(rt_spc_rt + rt_hw, rt_spc_rt + rt_enc_vx + vx_hs)
+            rects = []
+            for _, shp in index.query("routing", layer, window, margin):
                 # convert box to grid unit (db -> user)
                 x0 = round(shp.x[0] / tech.unit["user"])
                 x1 = round(shp.x[1] / tech.unit["user"])
@@ -392,284 +298,295 @@ class Preprocess:
                 y1_2 = y1 + rt_spc_rt + rt_enc_vx + vx_hs
 
                 # add blockage on the grid
-                for row in graph.grid3d[route[layer]]:
-                    for node in row:
-                        if node.x >= x0_1 and node.x <= x1_1 and node.y >= y0_1 and node.y <= y1_1:
-                            node.obstacle = True
+                rects.append((x0_1, x1_1, y0_1, y1_1, True, None))
+                rects.append((x0_2, x1_2, y0_2, y1_2, None, True))
+
+            graph.mark_rects(route[layer], rects)
+
 
-                        if node.x >= x0_2 and node.x <= x1_2 and node.y >= y0_2 and node.y <= y1_2:
-                            node.vertical_block = True
+    def merge_shapes(self, group: Group) -> None:
+        """
+        Merge the shapes of each layer of a group without changing the covered area:
+        the duplicated shapes (e.g. the vias shared by two paths) and the shapes inside
+        another shape are removed, and the collinear shapes overlapping or touching each
+        other (same width, in x or in y) are joined into one.
+        """
+        for layer in group.shape:
+            boxes = [(box.x[0], box.x[1], box.y[0], box.y[1]) for box in group.shape[layer]]
+            if len(boxes) < 2:
+                continue
+
+            count = None
+            while count != len(boxes):
+                count = len(boxes)
+
+                # remove the duplicated and contained boxes: sweep along x (a box after the boxes containing
+                # it), a box is contained in an active kept box (started before it and not ended) covering it
+                kept = []
+                active = []     # heap of (x1, box)
+                for box in sorted(set(boxes), key=lambda b: (b[0], -b[1], b[2], -b[3])):
+                    while active and active[0][0] < box[0]:
+                        heapq.heappop(active)
+
+                    if not any(box[1] <= k[1] and k[2] <= box[2] and box[3] <= k[3] for _, k in active):
+                        kept.append(box)
+                        heapq.heappush(active, (box[1], box))
+
+                # join the boxes of the same rows (along x), then of the same columns (along y)
+                boxes = self.join_boxes(kept, 0)
+                boxes = self.join_boxes(boxes, 2)
+
+            group.shape[layer] = [Box(layer, [x0, y0], [x1, y1]) for x0, x1, y0, y1 in sorted(boxes, key=lambda b: (b[2], b[0], b[3], b[1]))]
+
+
+    def join_boxes(self, boxes: list, axis: int) -> list:
+        # join the boxes with the same extent in the other axis, overlapping or touching along the axis
+        other = 2 - axis
+        lines = {}
+        for box in boxes:
+            lines.setdefault((box[other], box[other+1]), []).append(box)
+
+        joined = []
+        for line in lines.values():
+            line.sort(key=lambda b: b[axis])
+            curr = list(line[0])
+            for box in line[1:]:
+                if box[axis] <= curr[axis+1]:
+                    curr[axis+1] = max(curr[axis+1], box[axis+1])
+                else:
+                    joined.append(tuple(curr))
+                    curr = list(box)
+            joined.append(tuple(curr))
+
+        return joined
+
+
+    def layout_tables(self, rules: TechRules) -> dict:
+        """
+        The layout rules of each routing layer index as arrays (nan if not defined), for the via
+        to the layer above (up) and below (down).
+        """
+        layers = ROUTE_LAYERS[:self.total_layers]
+        nan = float("nan")
+
+        tables = {"min_width": [rules.min_width[layer] for layer in layers],
+                  "min_spacing": [rules.min_spacing[layer] for layer in layers]}
+        for side, offset in [("up", 0), ("down", -1)]:
+            vias = [ROUTE_VIA[layers[z+offset]] if 0 <= z+offset < len(layers)-1 else None for z in range(len(layers))]
+            tables["via_size_"+side] = [rules.via_size.get(via, nan) for via in vias]
+            tables["landing_"+side] = [rules.landing_width.get((layer, via), nan) for layer, via in zip(layers, vias)]
+            tables["landing_eol_"+side] = [rules.landing_width_eol.get((layer, via), nan) for layer, via in zip(layers, vias)]
+            tables["stack_wide_"+side] = [rules.stack_width_wide.get((layer, via), nan) for layer, via in zip(layers, vias)]
+
+        tables = {key: np.array(tables[key]) for key in tables}
+        tables.update(self.via_templates(tables))
+        return tables
+
+
+    def via_templates(self, tables: dict) -> dict:
+        """
+        The via and stacked via shapes of each (from layer, to layer, horizontal) as offsets from the
+        via center, in the layout order: the via, then for each layer in between its landing and via.
+        The template of a via is (from layer * number of layers + to layer) * 2 + horizontal, where
+        horizontal is the direction of the segment before the via (it orients the stacked landings).
+        """
+        nroute = self.total_layers
+        start, length, last, ids, subs, boxes = [], [], [], [], [], []
+
+        def square(half: float) -> list:
+            return [-half, half, -half, half]
+
+        for z_from in range(nroute):
+            for z_to in range(nroute):
+                for horizontal in [False, True]:
+                    start.append(len(ids))
+                    if z_from == z_to:
+                        length.append(0)
+                        last.append(0)
+                        continue
+
+                    # via of the from layer
+                    up = z_from < z_to
+                    z_cut = z_from if up else z_from-1
+                    ids.append(nroute + z_cut)
+                    subs.append(1)
+                    boxes.append(square(tables["via_size_up"][z_cut] / 2))
+
+                    # stacked vias: the landing and via of each layer in between (the via towards the from layer)
+                    for step in range(1, abs(z_to - z_from)):
+                        z_mid = z_from + step if up else z_from - step
+                        width = tables["landing_eol_down" if up else "landing_eol_up"][z_mid]
+                        wide = tables["stack_wide_down" if up else "stack_wide_up"][z_mid]
+                        half_x = (wide if horizontal else width) / 2
+                        half_y = (width if horizontal else wide) / 2
+                        ids.append(z_mid)
+                        subs.append(2 * step)
+                        boxes.append([-half_x, half_x, -half_y, half_y])
+
+                        z_mid_cut = z_mid-1 if up else z_mid
+                        ids.append(nroute + z_mid_cut)
+                        subs.append(2 * step + 1)
+                        boxes.append(square(tables["via_size_up"][z_mid_cut] / 2))
+
+                    length.append(len(ids) - start[-1])
+                    last.append(len(ids) - 1)
+
+        return {"stack_start": np.array(start, dtype=int), "stack_length": np.array(length, dtype=int),
+                "stack_last": np.array(last, dtype=int), "stack_id": np.array(ids, dtype=int),
+                "stack_sub": np.array(subs, dtype=int), "stack_box": np.array(boxes, dtype=float).reshape(-1, 4)}
 
 
     def path_layout(self, tech: Tech, group: Group, paths: list):
-        metal = {0: "poly", 1: "metal1", 2: "metal2", 3: "metal3", 4: "metal4", 5: "metal5", 6: "metal6"}
-        via = {(0,1): "contact", (1,2): "via12", (2,3): "via23", (3,4): "via34", (4,5): "via45", (5,6): "via56",
-            (1,0): "contact", (2,1): "via12", (3,2): "via23", (4,3): "via34", (5,4): "via45", (6,5): "via56"}
-
-        for path in paths:
-
-            ##### Poly or Metal Route Layout #####
-            for i in range(len(path)-1):
-                # same layer for current and next node
-                if path[i][2] == path[i+1][2]:      
-                    # add metal
-                    metal_layer = metal[path[i][2]]
-                
-                    # X-coordinates
-                    if path[i][0] == path[i+1][0]:
-                        # poly path
-                        if path[i][2] == 0:
-                            # print("poly path ver (x-coor):", path[i][0], path[i+1][0])
-                            x0 = (path[i][0] * tech.unit["user"]) - tech.min_width_rule["poly"] / 2
-                            x1 = (path[i][0] * tech.unit["user"]) + tech.min_width_rule["poly"] / 2
-                        # metal path
-                        else:
-                            x0 = (path[i][0] * tech.unit["user"]) - tech.min_width_rule[metal_layer] / 2
-                            x1 = (path[i][0] * tech.unit["user"]) + tech.min_width_rule[metal_layer] / 2
-                    else:
-                        # poly path
-                        if path[i][2] == 0:
-                            # print("poly path hor (x-coor)", path[i][0], path[i+1][0])
-                            x0 = min(path[i][0], path[i+1][0]) * tech.unit["user"] - tech.min_width_rule["poly"] / 2
-                            x1 = max(path[i][0], path[i+1][0]) * tech.unit["user"] + tech.min_width_rule["poly"] / 2
-                        # metal path
-                        else:
-                            x0 = min(path[i][0], path[i+1][0]) * tech.unit["user"] - tech.min_width_rule[metal_layer] / 2
-                            x1 = max(path[i][0], path[i+1][0]) * tech.unit["user"] + tech.min_width_rule[metal_layer] / 2
-
-                    # Y-coordinates
-                    if path[i][1] == path[i+1][1]:
-                        # poly path
-                        if path[i][2] == 0:
-                            # print("poly path hor (y-coor)", path[i][1], path[i+1][1])
-                            y0 = (path[i][1] * tech.unit["user"]) - tech.min_width_rule["poly"] / 2
-                            y1 = (path[i][1] * tech.unit["user"]) + tech.min_width_rule["poly"] / 2
-                        # metal path
-                        else:
-                            y0 = (path[i][1] * tech.unit["user"]) - tech.min_width_rule[metal_layer] / 2
-                            y1 = (path[i][1] * tech.unit["user"]) + tech.min_width_rule[metal_layer] / 2
-                    else:
-                        # poly path
-                        if path[i][2] == 0:
-                            # print("poly path ver (y-coor)", path[i][1], path[i+1][1])
-                            y0 = min(path[i][1], path[i+1][1]) * tech.unit["user"] - tech.min_width_rule["poly"] / 2
-                            y1 = max(path[i][1], path[i+1][1]) * tech.unit["user"] + tech.min_width_rule["poly"] / 2
-                        # metal path
-                        else:
-                            y0 = min(path[i][1], path[i+1][1]) * tech.unit["user"] - tech.min_width_rule[metal_layer] / 2
-                            y1 = max(path[i][1], path[i+1][1]) * tech.unit["user"] + tech.min_width_rule[metal_layer] / 2
-
-                    # add the shape
-                    group.shape[metal_layer].append(Box(metal_layer, [x0, y0], [x1, y1]))
+        """
+        Generate the wire, via landing, via and stacked via shapes of the paths.
+        The shapes of all the paths are computed as columns (x0, x1, y0, y1) at once, and the
+        Box objects are only created when they are added to the group.
+        """
+        paths = [path for path in paths if len(path) > 1]
+        if not paths:
+            return
 
-            
-            ##### Via Layout #####
-            prev_direction, next_direction = "", ""
-            prev_distance, next_distance = 0, 0
-            for i in range(len(path)-1):
-                # different layer for current and next node
-                if path[i][2] != path[i+1][2]:
-                    # get previous direction
-                    if i > 0:
-                        if path[i-1][0] < path[i][0]:
-                            prev_direction = "left_to_right"
-                            prev_distance = path[i][0] - path[i-1][0]
-                        elif path[i-1][0] > path[i][0]:
-                            prev_direction = "right_to_left"
-                            prev_distance = path[i-1][0] - path[i][0]
-                        elif path[i-1][1] < path[i][1]:
-                            prev_direction = "down_to_up"
-                            prev_distance = path[i][1] - path[i-1][1]
-                        elif path[i-1][1] > path[i][1]:
-                            prev_direction = "up_to_down"
-                            prev_distance = path[i-1][1] - path[i][1]
-                    else:
-                        prev_direction = "left_to_right"
-                        prev_distance = 0
-
-                    # previous layer
-                    prev_layer = metal[path[i][2]]
-                    prev_via_layer = via[(path[i][2], path[i][2]+1)] if path[i][2] < path[i+1][2] else via[(path[i][2], path[i][2]-1)]
-                    prev_route_width = tech.min_size_rule[prev_via_layer] + 2*tech.min_enclosure_rule[prev_layer, prev_via_layer]
-                    prev_route_width_eol = tech.min_size_rule[prev_via_layer] + 2*tech.min_enclosure_rule[prev_layer, prev_via_layer, "end"]
-
-                    if prev_direction == "left_to_right":
-                        # print("prev_direction: left_to_right","distance:", prev_distance)
-                        if (prev_distance * tech.unit["user"]) > prev_route_width_eol + tech.min_spacing_rule[(prev_layer, prev_layer)]:
-                            x0 = (path[i][0] * tech.unit["user"]) - prev_route_width_eol / 2
-                        else:
-                            x0 = (path[i-1][0] * tech.unit["user"]) - tech.min_width_rule[prev_layer] / 2
-
-                        x1 = (path[i][0] * tech.unit["user"]) + prev_route_width_eol / 2
-                        y0 = (path[i][1] * tech.unit["user"]) - prev_route_width / 2
-                        y1 = (path[i][1] * tech.unit["user"]) + prev_route_width / 2
-
-                    elif prev_direction == "right_to_left":
-                        # print("prev_direction: right_to_left","prev_distance:", prev_distance)
-                        if (prev_distance * tech.unit["user"]) > prev_route_width_eol + tech.min_spacing_rule[(prev_layer, prev_layer)]:
-                            x1 = (path[i][0] * tech.unit["user"]) + prev_route_width_eol / 2
-                        else:
-                            x1 = (path[i-1][0] * tech.unit["user"]) + tech.min_width_rule[prev_layer] / 2
-
-                        x0 = (path[i][0] * tech.unit["user"]) - prev_route_width_eol / 2
-                        y0 = (path[i][1] * tech.unit["user"]) - prev_route_width / 2
-                        y1 = (path[i][1] * tech.unit["user"]) + prev_route_width / 2
-
-                    elif prev_direction == "down_to_up":
-                        # print("prev_direction: down_to_up","prev_distance:", prev_distance)
-                        if (prev_distance * tech.unit["user"]) > prev_route_width_eol + tech.min_spacing_rule[(prev_layer, prev_layer)]: 
-                            y0 = (path[i][1] * tech.unit["user"]) - prev_route_width_eol / 2
-                        else:
-                            y0 = (path[i-1][1] * tech.unit["user"]) - tech.min_width_rule[prev_layer] / 2
-
-                        x0 = (path[i][0] * tech.unit["user"]) - prev_route_width / 2
-                        x1 = (path[i][0] * tech.unit["user"]) + prev_route_width / 2
-                        y1 = (path[i][1] * tech.unit["user"]) + prev_route_width_eol / 2
-                    
-                    elif prev_direction == "up_to_down":
-                        # print("prev_direction: up_to_down","prev_distance:", prev_distance)
-                        if (prev_distance * tech.unit["user"]) > prev_route_width_eol + tech.min_spacing_rule[(prev_layer, prev_layer)]:
-                            y1 = (path[i][1] * tech.unit["user"]) + prev_route_width_eol / 2
-                        else:
-                            y1 = (path[i-1][1] * tech.unit["user"]) + tech.min_width_rule[prev_layer] / 2
-
-                        x0 = (path[i][0] * tech.unit["user"]) - prev_route_width / 2
-                        x1 = (path[i][0] * tech.unit["user"]) + prev_route_width / 2
-                        y0 = (path[i][1] * tech.unit["user"]) - prev_route_width_eol / 2
-
-                    # add the shape
-                    group.shape[prev_layer].append(Box(prev_layer, [x0, y0], [x1, y1]))
-
-                    # via layer
-                    via_width = tech.min_size_rule[prev_via_layer]
-
-                    x0 = (path[i][0] * tech.unit["user"]) - via_width / 2
-                    x1 = (path[i][0] * tech.unit["user"]) + via_width / 2
-                    y0 = (path[i][1] * tech.unit["user"]) - via_width / 2
-                    y1 = (path[i][1] * tech.unit["user"]) + via_width / 2
-
-                    # add the shape
-                    group.shape[prev_via_layer].append(Box(prev_via_layer, [x0, y0], [x1, y1]))
-
-                    # middle layer
-                    # print("path[i][2]:", path[i][2], "path[i+1][2]:", path[i+1][2])
-                    if path[i][2] < path[i+1][2]:
-                        start = int(path[i][2])+1
-                        end = int(path[i+1][2])
-                        step = 1
-                    else:
-                        start = int(path[i][2])-1
-                        end = int(path[i+1][2])
-                        step = -1
-    
-                    for mid_layer_idx in range(start, end, step):
-                        # print("mid_layer_idx:", mid_layer_idx)
-                        mid_layer = metal[mid_layer_idx]
-                        mid_via_layer = via[(mid_layer_idx, mid_layer_idx+1)] if mid_layer_idx < path[i][2] else via[(mid_layer_idx, mid_layer_idx-1)]
-                        mid_route_width = tech.min_size_rule[mid_via_layer] + 2*tech.min_enclosure_rule[mid_layer, mid_via_layer, "end"]
-                        mid_route_width_wide = tech.min_area_rule[mid_layer] / mid_route_width
-                        mid_route_width_wide = math.ceil(mid_route_width_wide / 2 / tech.unit["grid"]) * 2 * tech.unit["grid"]
-
-                        if prev_direction == "left_to_right" or prev_direction == "right_to_left":
-                            x0 = (path[i][0] * tech.unit["user"]) - mid_route_width_wide / 2
-                            x1 = (path[i][0] * tech.unit["user"]) + mid_route_width_wide / 2
-                            y0 = (path[i][1] * tech.unit["user"]) - mid_route_width / 2
-                            y1 = (path[i][1] * tech.unit["user"]) + mid_route_width / 2
-                        elif prev_direction == "down_to_up" or prev_direction == "up_to_down":
-                            x0 = (path[i][0] * tech.unit["user"]) - mid_route_width / 2
-                            x1 = (path[i][0] * tech.unit["user"]) + mid_route_width / 2
-                            y0 = (path[i][1] * tech.unit["user"]) - mid_route_width_wide / 2
-                            y1 = (path[i][1] * tech.unit["user"]) + mid_route_width_wide / 2
-
-                        # add the shape
-                        group.shape[mid_layer].append(Box(mid_layer, [x0, y0], [x1, y1]))
-
-                        # via layer
-                        via_width = tech.min_size_rule[mid_via_layer]
-
-                        x0 = (path[i][0] * tech.unit["user"]) - via_width / 2
-                        x1 = (path[i][0] * tech.unit["user"]) + via_width / 2
-                        y0 = (path[i][1] * tech.unit["user"]) - via_width / 2
-                        y1 = (path[i][1] * tech.unit["user"]) + via_width / 2
-
-                        # add the shape
-                        group.shape[mid_via_layer].append(Box(mid_via_layer, [x0, y0], [x1, y1]))
-
-                    # get next direction
-                    if i < len(path)-2:
-                        if path[i+1][0] < path[i+2][0]:
-                            next_direction = "left_to_right"
-                            next_distance = path[i+2][0] - path[i+1][0]
-                        elif path[i+1][0] > path[i+2][0]:
-                            next_direction = "right_to_left"
-                            next_distance = path[i+1][0] - path[i+2][0]
-                        elif path[i+1][1] < path[i+2][1]:
-                            next_direction = "down_to_up"
-                            next_distance = path[i+2][1] - path[i+1][1]
-                        elif path[i+1][1] > path[i+2][1]:
-                            next_direction = "up_to_down"
-                            next_distance = path[i+1][1] - path[i+2][1]
-                    else:
-                        next_direction = "left_to_right"
-                        next_distance = 0
-
-                    # next layer
-                    next_layer = metal[path[i+1][2]]
-                    next_via_layer = via[(path[i+1][2], path[i+1][2]+1)] if path[i+1][2] < path[i][2] else via[(path[i+1][2], path[i+1][2]-1)]
-                    next_route_width = tech.min_size_rule[next_via_layer] + 2*tech.min_enclosure_rule[next_layer, next_via_layer]
-                    next_route_width_eol = tech.min_size_rule[next_via_layer] + 2*tech.min_enclosure_rule[next_layer, next_via_layer, "end"]
-
-                    if next_direction == "left_to_right":
-                        # print("next_direction: left_to_right","next_distance:", next_distance)
-                        if (next_distance * tech.unit["user"]) > next_route_width_eol + tech.min_spacing_rule[(next_layer, next_layer)]:
-                            x1 = (path[i+1][0] * tech.unit["user"]) + next_route_width_eol / 2
-                        else:
-                            if i < len(path)-2:
-                                x1 = (path[i+2][0] * tech.unit["user"]) + tech.min_width_rule[next_layer] / 2
-                            else:
-                                x1 = (path[i+1][0] * tech.unit["user"]) + next_route_width_eol / 2
-                            # x1 = (path[i+2][0] * tech.unit["user"]) + tech.min_width_rule[next_layer] / 2 
-
-                        x0 = (path[i+1][0] * tech.unit["user"]) - next_route_width_eol / 2
-                        y0 = (path[i+1][1] * tech.unit["user"]) - next_route_width / 2
-                        y1 = (path[i+1][1] * tech.unit["user"]) + next_route_width / 2
-
-                    elif next_direction == "right_to_left":
-                        # print("next_direction: right_to_left","next_distance:", next_distance)
-                        if (next_distance * tech.unit["user"]) > next_route_width_eol + tech.min_spacing_rule[(next_layer, next_layer)]:
-                            x0 = (path[i+1][0] * tech.unit["user"]) - next_route_width_eol / 2
-                        else:
-                            if i < len(path)-2:
-                                x0 = (path[i+2][0] * tech.unit["user"]) - tech.min_width_rule[next_layer] / 2
-                            else:
-                                x0 = (path[i+1][0] * tech.unit["user"]) - next_route_width_eol / 2
-                            # x0 = (path[i+2][0] * tech.unit["user"]) - tech.min_width_rule[next_layer] / 2
-
-                        x1 = (path[i+1][0] * tech.unit["user"]) + next_route_width_eol / 2
-                        y0 = (path[i+1][1] * tech.unit["user"]) - next_route_width / 2
-                        y1 = (path[i+1][1] * tech.unit["user"]) + next_route_width / 2
-
-                    elif next_direction == "down_to_up":
-                        # print("next_direction: down_to_up","next_distance:", next_distance)
-                        if (next_distance * tech.unit["user"]) > next_route_width_eol + tech.min_spacing_rule[(next_layer, next_layer)]:
-                            y1 = (path[i+1][1] * tech.unit["user"]) + next_route_width_eol / 2
-                        else:
-                            y1 = (path[i+2][1] * tech.unit["user"]) + tech.min_width_rule[next_layer] / 2
-
-                        x0 = (path[i+1][0] * tech.unit["user"]) - next_route_width / 2
-                        x1 = (path[i+1][0] * tech.unit["user"]) + next_route_width / 2
-                        y0 = (path[i+1][1] * tech.unit["user"]) - next_route_width_eol / 2
-
-                    elif next_direction == "up_to_down":
-                        # print("next_direction: up_to_down","next_distance:", next_distance)
-                        if (next_distance * tech.unit["user"]) > next_route_width_eol + tech.min_spacing_rule[(next_layer, next_layer)]:
-                            y0 = (path[i+1][1] * tech.unit["user"]) - next_route_width_eol / 2
-                        else:
-                            y0 = (path[i+2][1] * tech.unit["user"]) - tech.min_width_rule[next_layer] / 2
-
-                        x0 = (path[i+1][0] * tech.unit["user"]) - next_route_width / 2
-                        x1 = (path[i+1][0] * tech.unit["user"]) + next_route_width / 2
-                        y1 = (path[i+1][1] * tech.unit["user"]) + next_route_width_eol / 2
-
-                    # add the shape
-                    group.shape[next_layer].append(Box(next_layer, [x0, y0], [x1, y1]))
\ No newline at end of file
+        # layout tables and via templates of the technology (built once)
+        rules = tech_rules(tech, self.total_layers)
+        if self.tables is None or self.tables[0] is not rules:
+            self.tables = (rules, self.layout_tables(rules))
+        layer_ids, columns = self.path_shapes(tech.unit["user"], self.tables[1], paths)
+
+        # route layers, then via layers (the via of index i is between the route layers i and i+1)
+        names = ROUTE_LAYERS[:self.total_layers] + [ROUTE_VIA[layer] for layer in ROUTE_LAYERS[:self.total_layers-1]]
+        for layer_id in np.unique(layer_ids).tolist():
+            layer = names[layer_id]
+            group.shape[layer] += [Box(layer, [x0, y0], [x1, y1]) for x0, x1, y0, y1 in columns[layer_ids == layer_id].tolist()]
+
+
+    def path_shapes(self, unit: float, tables: dict, paths: list) -> tuple:
+        """
+        The shapes of the paths, in the order of the per-segment layout (for each path: the
+        wires, then for each via: the previous landing, the via, the stacked vias and the next landing).
+        @param      unit    The user unit
+        @param      tables  The layout rules of the layers (layout_tables)
+        @param      paths   The paths (at least 2 points each)
+        @return     The layer id (route layer, or number of route layers + via index) and the
+                    (x0, x1, y0, y1) of each shape
+        """
+        nroute = self.total_layers
+        lengths = np.array([len(path) for path in paths])
+        points = np.array([pt for path in paths for pt in path], dtype=float)
+        x, y = points[:, 0], points[:, 1]
+        z = points[:, 2].astype(int)
+
+        # path of each point, index of the point in its path and length of its path
+        pid = np.repeat(np.arange(len(paths)), lengths)
+        first = np.repeat(np.cumsum(lengths) - lengths, lengths)
+        local = np.arange(len(points)) - first
+        length = lengths[pid]
+
+        # segments (between two points of the same path)
+        seg = np.nonzero(local[:-1] < length[:-1] - 1)[0]
+
+        ##### Poly or Metal Route Layout #####
+        wire = seg[z[seg] == z[seg+1]]
+        hw = tables["min_width"][z[wire]] / 2
+        wires = np.column_stack([np.minimum(x[wire], x[wire+1]) * unit - hw, np.maximum(x[wire], x[wire+1]) * unit + hw,
+                                 np.minimum(y[wire], y[wire+1]) * unit - hw, np.maximum(y[wire], y[wire+1]) * unit + hw])
+        ids, order, shapes = [z[wire]], [np.stack([pid[wire], np.zeros(len(wire), int), wire], axis=1)], [wires]
+
+        ##### Via Layout #####
+        vias = seg[z[seg] != z[seg+1]]
+        if len(vias):
+            # planar direction of the segment starting at each point (0: none or end of path) and its length
+            # 1: left_to_right, 2: right_to_left, 3: down_to_up, 4: up_to_down
+            dx = np.append(x[1:] - x[:-1], 0)
+            dy = np.append(y[1:] - y[:-1], 0)
+            direction = np.select([dx > 0, dx < 0, dy > 0, dy < 0], [1, 2, 3, 4], 0)
+            direction[local == length - 1] = 0
+            distance = np.select([dx != 0, dy != 0], [np.abs(dx), np.abs(dy)], 0)
+
+            def carried(index: np.ndarray, valid: np.ndarray) -> tuple:
+                # direction and length of the segment at each via; a via next to a vertical segment
+                # keeps those of the previous via of the path, a via at the path end is left_to_right
+                # of length 0, and a via without any is undefined (0)
+                index = np.where(valid, index, 0)
+                known = ~valid | (direction[index] != 0)
+                last = np.maximum.accumulate(np.where(known, np.arange(len(index)), -1))
+                defined = (last >= 0) & (pid[vias[np.maximum(last, 0)]] == pid[vias])
+                last = np.maximum(last, 0)
+                d = np.where(defined, np.where(valid, direction[index], 1)[last], 0)
+                l = np.where(defined, np.where(valid, distance[index], 0)[last], 0)
+                return d, l
+
+            has_prev = local[vias] > 0
+            has_next = local[vias] < length[vias] - 2
+            prev_dir, prev_dist = carried(vias - 1, has_prev)
+            next_dir, next_dist = carried(vias + 1, has_next)
+
+            up = z[vias] < z[vias+1]
+            xi, yi = x[vias] * unit, y[vias] * unit
+            xn, yn = x[vias+1] * unit, y[vias+1] * unit
+            prev = np.where(has_prev, vias - 1, first[vias] + length[vias] - 1)     # (the last point for the first point)
+            xp, yp = x[prev] * unit, y[prev] * unit
+            far = np.where(has_next, vias + 2, vias + 1)
+            x2, y2 = x[far] * unit, y[far] * unit
+
+            def landing(z_land: np.ndarray, land_up: np.ndarray, xc, yc, direc, dist, x_far, y_far, is_next: bool) -> np.ndarray:
+                # via landing on a layer, extended to the far point if the segment is too short
+                width = np.where(land_up, tables["landing_up"][z_land], tables["landing_down"][z_land])
+                eol = np.where(land_up, tables["landing_eol_up"][z_land], tables["landing_eol_down"][z_land])
+                long = (dist * unit) > eol + tables["min_spacing"][z_land]
+                mw = tables["min_width"][z_land] / 2
+
+                x0, x1 = xc - eol / 2, xc + eol / 2
+                y0, y1 = yc - width / 2, yc + width / 2
+                vx0, vx1 = xc - width / 2, xc + width / 2
+                vy0, vy1 = yc - eol / 2, yc + eol / 2
+                if is_next:
+                    # a left/right landing at the path end keeps the end of line length
+                    lr = [x0, np.where(long, x1, np.where(has_next, x_far + mw, x1))]
+                    rl = [np.where(long, x0, np.where(has_next, x_far - mw, x0)), x1]
+                    du = [vy0, np.where(long, vy1, y_far + mw)]
+                    ud = [np.where(long, vy0, y_far - mw), vy1]
+                else:
+                    lr = [np.where(long, x0, x_far - mw), x1]
+                    rl = [x0, np.where(long, x1, x_far + mw)]
+                    du = [np.where(long, vy0, y_far - mw), vy1]
+                    ud = [vy0, np.where(long, vy1, y_far + mw)]
+
+                cond = [direc == 1, direc == 2, direc == 3, direc == 4]
+                return np.column_stack([np.select(cond, [lr[0], rl[0], vx0, vx0]), np.select(cond, [lr[1], rl[1], vx1, vx1]),
+                                        np.select(cond, [y0, y0, du[0], ud[0]]), np.select(cond, [y1, y1, du[1], ud[1]])])
+
+            def cut(z_low: np.ndarray, xc, yc) -> np.ndarray:
+                # via between the layers z_low and z_low+1
+                half = tables["via_size_up"][z_low] / 2
+                return np.column_stack([xc - half, xc + half, yc - half, yc + half])
+
+            def key(via_idx: np.ndarray, sub) -> np.ndarray:
+                # (path, after the wires, via and shape of the via)
+                return np.stack([pid[vias[via_idx]], np.ones(len(via_idx), int), vias[via_idx] * (2 * nroute + 2) + sub], axis=1)
+
+            index = np.arange(len(vias))
+            ids.append(z[vias])
+            order.append(key(index, 0))
+            shapes.append(landing(z[vias], up, xi, yi, prev_dir, prev_dist, xp, yp, False))
+
+            # via and stacked vias: the template of the via layers translated to the via
+            template = (z[vias] * nroute + z[vias+1]) * 2 + (prev_dir <= 2)
+            count = tables["stack_length"][template]
+            via_idx = np.repeat(index, count)
+            row = np.repeat(tables["stack_start"][template], count) + np.arange(len(via_idx)) - np.repeat(np.cumsum(count) - count, count)
+            center = np.column_stack([xi, xi, yi, yi])
+            ids.append(tables["stack_id"][row])
+            order.append(key(via_idx, tables["stack_sub"][row]))
+            shapes.append(tables["stack_box"][row] + center[via_idx])
+            last_cut = tables["stack_box"][tables["stack_last"][template]] + center
+
+            # next landing (an undefined direction repeats the last via shape)
+            next_landing = landing(z[vias+1], ~up, xn, yn, next_dir, next_dist, x2, y2, True)
+            next_landing[next_dir == 0] = last_cut[next_dir == 0]
+            ids.append(z[vias+1])
+            order.append(key(index, 2 * nroute + 1))
+            shapes.append(next_landing)
+
+        order = np.concatenate(order)
+        sort = np.lexsort((order[:, 2], order[:, 1], order[:, 0]))
+        return np.concatenate(ids)[sort], np.concatenate(shapes)[sort]
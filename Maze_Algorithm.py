@@ -1,38 +1,81 @@
 from Module.DB import *
+from Device_Router.RouteMetrics import logger
+from Device_Router.SearchBudget import BudgetTracker
+from concurrent.futures import wait
 
-def route_two_pins(grid, source: tuple, targets: list) -> list:
+# number of expanded nodes between two checks of the search budget
+BUDGET_CHECK = 4096
+
+class SearchContext:
+    """
+    State of one search on a grid: the step count of the nodes reached by the wave, and the nodes
+    visited by the backtracking. The grid is only read by the search, so several searches can run
+    on the same grid at once (e.g. the pin groups of a net on a thread pool).
+    """
+    def __init__(self, grid=None, corridor=None, budget: BudgetTracker=None) -> None:
+        """
+        @param      grid  The grid of the search (a graph with its own search_state stores the state compactly)
+        @param      corridor  The nodes the wave is confined to (a container of nodes, e.g. GlobalRoute.Corridor; None: all the nodes)
+        @param      budget  The search budget charged with the expanded nodes (None: no limit)
+        """
+        self.corridor = corridor
+        self.budget = budget
+        if hasattr(grid, "search_state"):
+            self.step = grid.search_state("i")
+            self.visited = grid.search_state("b")
+        else:
+            self.step = {}          # node -> step count from the source
+            self.visited = set()    # nodes visited by the backtracking
+
+
+    def release(self) -> None:
+        """
+        Free the state of a finished search (counted in the memory budget of a tiled graph).
+        """
+        for state in (self.step, self.visited):
+            if hasattr(state, "release"):
+                state.release()
+
+
+def route_two_pins(grid, source: tuple, targets: list, stats: dict=None, corridor=None, budget: BudgetTracker=None) -> list:
     """
     @brief      Routing two pins from single source to the nearest target.
     @param      source: The source node
     @param      target: The list of target nodes
+    @param      stats:  The search counters (nodes_expanded) to update
+    @param      corridor: The nodes the search is confined to (optional)
+    @param      budget: The search budget, BudgetExceeded is raised when it is exhausted (optional)
     @return     path: The path from source to the nearest target
     @return     step: The step count of each node
     """
     # Wave propagation using BFS to get step count
-    print("   >> Wave Propagation...", end="")
-    target = bfs_multi_target(grid, source, targets)               # multi target breadth first search
+    context = SearchContext(grid, corridor, budget)
+    try:
+        target = bfs_multi_target(grid, source, targets, stats, context)   # multi target breadth first search
+        path = dfs_backtrack(grid, source, target, context) if target else None    # depth first search backtracking
+    finally:
+        context.release()
 
     if target:
-        print("Backtracking...", end="")
-        path = dfs_backtrack(grid, source, target)                 # depth first search backtracking
 
         if path:
-            print("Success. Path Length: {}".format(len(path)))
+            logger.debug("   >> Wave Propagation...Backtracking...Success. Path Length: %d", len(path))
         else:
             path = None
-            print("Failed.")
+            logger.debug("   >> Wave Propagation...Backtracking...Failed.")
     else:
         # set path to None
         path = None
-        print("Failed.")
+        logger.debug("   >> Wave Propagation...Failed.")
 
     return path
 
 
-def route_multi_pins(grid, pins: list) -> list:
+def route_multi_pins(grid, pins: list, stats: dict=None) -> list:
     """
     @brief      Routing multiple pins using the method of multiple sources in routed path.
     @param      pins  The pins in list form
+    @param      stats The search counters to update
     @return     The path and step count of each node
     """
     # initialize variables
@@ -42,7 +85,7 @@ def route_multi_pins(grid, pins: list) -> list:
     targets = pins.copy()
     source = targets.pop(0)
 
-    path = route_two_pins(grid, source, targets)  # route two pins
+    path = route_two_pins(grid, source, targets, stats)  # route two pins
 
     if path:                                                # if path found
         # self.grid.addObstacle_coord(path)                 # mark path as obstacle
@@ -59,7 +102,7 @@ def route_multi_pins(grid, pins: list) -> list:
     while sources:                                          # while there are sources     
         source = sources.pop(0)                             # set path nodes as source
 
-        path = route_two_pins(grid, source, targets)     # route two pins
+        path = route_two_pins(grid, source, targets, stats)     # route two pins
         if path:                                                # if path found
             # self.grid.addObstacle_coord(path)                 # mark path as obstacle
             paths.append(path)                                  # add path to list
@@ -70,15 +113,18 @@ def route_multi_pins(grid, pins: list) -> list:
             return None
             
     path_len = sum([len(path) for path in paths])
-    print("Total Path Length: {}".format(path_len))
+    logger.debug("Total Path Length: %d", path_len)
 
     return paths
 
 
-def route_multi_pins_2(grid, pins: list) -> list:
+def route_multi_pins_2(grid, pins: list, stats: dict=None, corridor=None, budget: BudgetTracker=None) -> list:
     """
     @brief      Routing multiple pins using the method of multiple sources in routed path.
     @param      pins  The pins in list form
+    @param      stats The search counters to update
+    @param      corridor The nodes the searches are confined to (optional)
+    @param      budget The search budget (optional)
     @return     The path and step count of each node
     """
     # initialize variables
@@ -89,7 +135,7 @@ def route_multi_pins_2(grid, pins: list) -> list:
     source = targets.pop(0)
 
     # Phase 1: Get the first path
-    path = route_two_pins(grid, source, [targets[0]])           # route two pins
+    path = route_two_pins(grid, source, [targets[0]], stats, corridor, budget)    # route two pins
     if path:                                                    # if path found
         # self.grid.addObstacle_coord(path)                       # mark path as obstacle
         paths.append(path)                                      # add path to list
@@ -114,29 +160,45 @@ def route_multi_pins_2(grid, pins: list) -> list:
             targets.remove(sources[src_tar_idx[0]])
             continue
 
-        path = route_two_pins(grid, sources[src_tar_idx[0]], [targets[src_tar_idx[1]]])  # route two pins
+        path = route_two_pins(grid, sources[src_tar_idx[0]], [targets[src_tar_idx[1]]], stats, corridor, budget)  # route two pins
         if path:                                                # if path found
             paths.append(path)                                      # add path to list
             targets.remove(path[-1])                                # remove target from pins
             sources.extend(path)                                    # add path to sources
         else:
-            print("Failed to route path. func: route_multi_pins_2")
-            print("source: {}, target: {}".format((sources[src_tar_idx[0]].x, sources[src_tar_idx[0]].y, sources[src_tar_idx[0]].z), (targets[src_tar_idx[1]].x, targets[src_tar_idx[1]].y, targets[src_tar_idx[1]].z)))
+            logger.debug("Failed to route path. func: route_multi_pins_2")
+            logger.debug("source: {}, target: {}".format((sources[src_tar_idx[0]].x, sources[src_tar_idx[0]].y, sources[src_tar_idx[0]].z), (targets[src_tar_idx[1]].x, targets[src_tar_idx[1]].y, targets[src_tar_idx[1]].z)))
             return None
 
     return paths
         
 
-def route_multi_pins_group(grid, pins: list) -> list:
+def route_multi_pins_group(grid, pins: list, stats: dict=None, executor=None, corridor=None, budget: BudgetTracker=None) -> list:
     """
     @brief      Routing multiple pins using the method of multiple sources in routed path.
     @param      pins  The pins in list form
+    @param      stats The search counters to update
+    @param      executor The executor (e.g. a thread pool) routing the pins of each group at the same time (optional)
+    @param      corridor The nodes the searches are confined to (optional)
+    @param      budget The search budget (optional)
     @return     The path and step count of each node
     """
     # initialize variables
     paths = []
     group = []
 
+    # route the pins inside each group (independent searches, each with its own state)
+    routed = [pin_list for pin_list in pins if len(pin_list) > 1]
+    if executor is not None:
+        group_stats = [{} for pin_list in routed]
+        futures = [executor.submit(route_multi_pins_2, grid, pin_list, group_stats[i], corridor, budget) for i, pin_list in enumerate(routed)]
+        wait(futures)
+        if stats is not None:
+            stats["nodes_expanded"] = stats.get("nodes_expanded", 0) + sum([s.get("nodes_expanded", 0) for s in group_stats])
+        group_paths = [future.result() for future in futures]     # raise the error of a group (e.g. BudgetExceeded)
+    else:
+        group_paths = [route_multi_pins_2(grid, pin_list, stats, corridor, budget) for pin_list in routed]
+
     # get the group of pins from the pin list
     for pin_list in pins:
         # if there is only one pin in the group
@@ -145,14 +207,14 @@ def route_multi_pins_group(grid, pins: list) -> list:
             continue
 
         # in each group of pins, route the pins
-        path = route_multi_pins_2(grid, pin_list)
+        path = group_paths.pop(0)
 
         if path:
             # get each nodes from the path and make it a list
             node = [coor for seg in path for coor in seg]
 
-            # add the list of nodes (unique) to the group
-            group.append(list(set(node)))
+            # add the list of nodes (unique, in path order) to the group
+            group.append(list(dict.fromkeys(node)))
         else:
             # need to reiterate the whole grid creation
             return None
@@ -179,7 +241,7 @@ def route_multi_pins_group(grid, pins: list) -> list:
             continue
 
         # route two pins after get the best length
-        path = route_two_pins(grid, sources[src_tar_idx[0]], [targets[src_tar_idx[1]]])  # route two pins
+        path = route_two_pins(grid, sources[src_tar_idx[0]], [targets[src_tar_idx[1]]], stats, corridor, budget)  # route two pins
         if path:
             paths.append(path)                                      # add path to list
             sources.extend(path)                                    # add path to sources
@@ -191,73 +253,87 @@ def route_multi_pins_group(grid, pins: list) -> list:
     return paths
     
 
-def bfs_multi_target(grid, source, targets: list):
+def bfs_multi_target(grid, source, targets: list, stats: dict=None, context: SearchContext=None):
     """
     @brief      Breath first search algorithm for step counting.
+    @param      stats:  The search counters, nodes_expanded is increased by the dequeued nodes
+    @param      context: The state of the search, the step counts are set in it (optional)
+
+    The budget of the context is charged and checked every BUDGET_CHECK expanded nodes and at the
+    end of the search.
     """
     # initialization
-    for lay in grid:
-        for row in lay:
-            for node in row:
-                # initialize visited and step
-                node.visited = False
-                node.step = None
+    context = context if context is not None else SearchContext(grid)
+    step = context.step
+    corridor = context.corridor
+    budget = context.budget
 
     # initialize queue
     queue = []
     queue.append(source) 
 
     # mark source as visited
-    source.visited = True
-    source.step = 0
-
-    while queue:
-        # dequeue
-        curr_node = queue.pop(0)
-
-        # add neighbors to queue    
-        for neighbor in curr_node.get_neighbors():
-
-            # if neighbor not visited
-            if not neighbor.visited:
-                # if neighbor is target (destination reached)
-                if neighbor in targets:
-                    neighbor.visited = True               # mark neighbor as visited
-                    neighbor.step = curr_node.step + 1    # increment step count
-                    return neighbor                       # exit function                                        
-                
-                # if neighbor is not an obstacle
-                if not neighbor.obstacle:
-                    neighbor.visited = True                                        # mark neighbor as visited
-                    neighbor.step = curr_node.step + 1    # increment step count
-                    queue.append(neighbor)   
+    step[source] = 0
+
+    expanded = 0
+    found = None
+    try:
+        while queue and found is None:
+            # dequeue
+            curr_node = queue.pop(0)
+            expanded += 1
+            if budget is not None and expanded % BUDGET_CHECK == 0:
+                budget.expand(BUDGET_CHECK)
+                budget.check()
+
+            # add neighbors to queue    
+            for neighbor in curr_node.get_neighbors():
+
+                # if neighbor not visited
+                if neighbor not in step:
+                    # if neighbor is target (destination reached)
+                    if neighbor in targets:
+                        step[neighbor] = step[curr_node] + 1  # mark neighbor as visited, increment step count
+                        found = neighbor
+                        break
                 
+                    # if neighbor is not an obstacle (and in the corridor of the search)
+                    if not neighbor.obstacle and (corridor is None or neighbor in corridor):
+                        step[neighbor] = step[curr_node] + 1  # mark neighbor as visited, increment step count
+                        queue.append(neighbor)   
+    finally:
+        # also the nodes expanded until the budget stopped the search
+        if stats is not None:
+            stats["nodes_expanded"] = stats.get("nodes_expanded", 0) + expanded
+
+    # charge the nodes expanded since the last check (a net of many short searches is checked too)
+    if budget is not None:
+        budget.expand(expanded % BUDGET_CHECK)
+        budget.check()
+
     # all neighbors visited and no path found
-    print(">> Wave Prop: No Path Found.") 
-    return None
+    if found is None:
+        logger.debug(">> Wave Prop: No Path Found.")
+    return found
 
 
-def dfs_backtrack(grid, source, target) -> list:
+def dfs_backtrack(grid, source, target, context: SearchContext) -> list:
     """
     @brief      Depth first search algorithm for backtracking (Iterative method).
     @param      source:     The source node
     @param      target:     The target node
-    @param      steps:      The step count of each node
+    @param      context:    The state of the search, with the step counts of the wave propagation
     @return     path:       The path from source to target
     """
-    # initialize visited and steps matrix
-    for lay in grid:
-        for row in lay:
-            for node in row:
-                # initialize visited
-                node.visited = False
+    step = context.step
+    visited = context.visited
 
     # initialize stack
     stack = []
     stack.append(target)
 
     # mark target as visited
-    target.visited = True
+    visited.add(target)
     path = []
 
     while stack:
@@ -265,14 +341,14 @@ def dfs_backtrack(grid, source, target) -> list:
         curr_node = stack.pop()
 
         # mark current as visited
-        curr_node.visited = True
+        visited.add(curr_node)
         path.append(curr_node)
 
         # add neighbors to stack    
         for neighbor in curr_node.get_neighbors():
                 
                 # if neighbor not visited and neighbor has a step count
-                if not neighbor.visited and neighbor.step is not None:
+                if neighbor not in visited and neighbor in step:
     
                     # if neighbor is source (destination reached)
                     if neighbor == source:
@@ -281,9 +357,9 @@ def dfs_backtrack(grid, source, target) -> list:
                         return path
                     
                     # if neighbor has one step count less than current node
-                    if neighbor.step == curr_node.step - 1:
+                    if step[neighbor] == step[curr_node] - 1:
                         stack.append(neighbor)
 
     # all neighbors visited and no path found
-    print(">> Backtrack: No Path Found.") 
-    return None
\ No newline at end of file
+    logger.debug(">> Backtrack: No Path Found.")
+    return None
@@ -0,0 +1,115 @@
+from Module.DB import *
+from Device_Router.TechRules import TechRules
+
+
+def access_points(rect: tuple, z: int, half_width: int) -> list:
+    """
+    The points to route of a pin (the end points of its center line).
+    @param      rect        The (x0, x1, y0, y1) pin rectangle in user units
+    @param      z           The routing layer of the pin
+    @param      half_width  The half min width of the layer in user units
+    @return     The list of (x, y, z) points
+    """
+    points = []
+
+    # get the four end points
+    x0 = rect[0] + half_width
+    x1 = rect[1] - half_width
+    y0 = rect[2] + half_width
+    y1 = rect[3] - half_width
+
+    # single end point
+    if x0 == x1 and y0 == y1:
+        points.append((x0, y0, z))
+    else:
+        # vertical pin (two end points)
+        if x0 == x1:
+            points.append((x0, y0, z))
+            points.append((x0, y1, z))
+        # horizontal pin (two end points)
+        elif y0 == y1:
+            points.append((x0, y0, z))
+            points.append((x1, y0, z))
+        # four end points
+        else:
+            points.append((x0, y0, z))
+            points.append((x1, y1, z))
+            points.append((x0, y1, z))
+            points.append((x1, y0, z))
+
+    return points
+
+
+class NetIndex:
+    """
+    Pins and ports of each net of a circuit, by layer, with their rectangle and points to route
+    in user units. Built once per circuit, so the grouping, the blockage and the port placement
+    do not scan all the pins of the circuit for each net.
+    The pins are in the order of the circuit.
+    """
+    def __init__(self, circuit: Circuit, rules: TechRules) -> None:
+        """
+        @param      circuit  The circuit
+        @param      rules    The design rules of the technology
+        """
+        self.rules = rules
+        self.ports = {}             # port -> Pin of its first metal1 shape
+        self.nets = {}              # net -> [Pin] of the instances
+        self.layers = {}            # net -> {layer: [Pin]} of the instances
+        self.all_pins = []          # Pin of the instances
+        self.rect = {}              # id(pin) -> (x0, x1, y0, y1) in user units
+        self.points = {}            # id(pin) -> [(x, y, z)] points to route
+
+        # ports
+        for name in circuit.port:
+            if "metal1" in circuit.port[name].shape:
+                m1_shape = circuit.port[name].shape["metal1"]
+
+                pt1 = [m1_shape[0].x[0], m1_shape[0].y[0]]
+                pt2 = [m1_shape[0].x[1], m1_shape[0].y[1]]
+                self.ports[name] = Pin(name, "metal1", pt1, pt2)
+                self.add_shape(self.ports[name])
+
+        # pins of the instances
+        for inst in circuit.group:
+            for pin in circuit.group[inst].pin:
+                self.nets.setdefault(pin.net, []).append(pin)
+                self.layers.setdefault(pin.net, {}).setdefault(pin.layer, []).append(pin)
+                self.all_pins.append(pin)
+                self.add_shape(pin)
+
+
+    def add_shape(self, pin: Pin) -> None:
+        # rectangle and points to route (user units)
+        unit = self.rules.unit
+        rect = (round(pin.pt1[0] / unit), round(pin.pt2[0] / unit), round(pin.pt1[1] / unit), round(pin.pt2[1] / unit))
+        self.rect[id(pin)] = rect
+        if pin.layer in self.rules.rt_layer2int:
+            self.points[id(pin)] = access_points(rect, self.rules.rt_layer2int[pin.layer], self.rules.half_width[pin.layer])
+
+
+    def pins(self, net: str, layer: str=None) -> list:
+        """
+        The pins of the instances on a net (on a layer if given).
+        """
+        if layer is None:
+            return self.nets.get(net, [])
+        return self.layers.get(net, {}).get(layer, [])
+
+
+    def net_pins(self) -> dict:
+        """
+        The pins of each net: the port first, then the pins of the instances
+        (the nets of the ports first, then in the order of the circuit).
+        """
+        nets = {name: [self.ports[name]] for name in self.ports}
+        for name in self.nets:
+            nets.setdefault(name, []).extend(self.nets[name])
+        return nets
+
+
+    def pin_points(self, pin: Pin) -> list:
+        """
+        The points to route of a pin of the index.
+        """
+        return self.points[id(pin)]
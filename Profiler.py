@@ -0,0 +1,159 @@
+import cProfile
+import io
+import json
+import os
+import pstats
+import re
+import sys
+import threading
+
+from Device_Router.RouteMetrics import logger
+
+BLOCKAGE_PHASES = ["diffusion_blockage", "route_path_blockage", "poly_pin_blockage", "metal_pin_blockage"]
+
+
+class StackSampler:
+    """
+    Sample the call stack of a thread at a fixed interval (folded stacks for flame graphs).
+    """
+    def __init__(self, interval: float=0.005) -> None:
+        self.interval = interval
+        self.stacks = {}
+        self.thread_id = None
+        self._stop = threading.Event()
+        self._thread = None
+
+
+    def start(self) -> None:
+        self.stacks = {}
+        self.thread_id = threading.get_ident()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append("{}:{}".format(os.path.basename(code.co_filename), code.co_name))
+                frame = frame.f_back
+
+            key = ";".join(reversed(stack))
+            self.stacks[key] = self.stacks.get(key, 0) + 1
+
+
+    def folded(self) -> str:
+        return "".join(["{} {}\n".format(stack, count) for stack, count in sorted(self.stacks.items())])
+
+
+class NetProfiler:
+    """
+    Opt-in profiling of maze_routing, one profile per net.
+
+    Each net is profiled with cProfile (<net>.prof and a <net>.txt summary) or with a stack
+    sampler (<net>.folded), written to the output directory. The nets whose grid build,
+    blockage or search time exceeds the thresholds are flagged in slow_nets.json.
+    """
+    def __init__(self, directory: str, mode: str="cprofile", interval: float=0.005,
+                 slow_search: float=1.0, slow_blockage: float=1.0, slow_grid: float=1.0) -> None:
+        """
+        @param      directory      The output directory
+        @param      mode           "cprofile" or "sample"
+        @param      interval       The sampling interval in seconds (sample mode)
+        @param      slow_search    The search time (s) above which a net is flagged
+        @param      slow_blockage  The blockage time (s, all passes) above which a net is flagged
+        @param      slow_grid      The grid build time (s) above which a net is flagged
+        """
+        if mode not in ["cprofile", "sample"]:
+            raise ValueError("Unknown profiling mode: " + mode)
+
+        self.directory = directory
+        self.mode = mode
+        self.interval = interval
+        self.threshold = {"search": slow_search, "blockage": slow_blockage, "grid_build": slow_grid}
+        self.nets = {}
+        self._profiler = None
+
+        os.makedirs(directory, exist_ok=True)
+
+
+    def filename(self, name: str, ext: str) -> str:
+        return os.path.join(self.directory, re.sub(r"[^\w.-]", "_", name) + ext)
+
+
+    def start(self, name: str) -> None:
+        if self.mode == "cprofile":
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        else:
+            self._profiler = StackSampler(self.interval)
+            self._profiler.start()
+
+
+    def stop(self, name: str, record: dict) -> list:
+        """
+        @brief      Stop the profile of the net, dump it and flag the net if it is slow
+        @param      name    The net name
+        @param      record  The metrics record of the net
+        @return     The slow phases of the net
+        """
+        if self.mode == "cprofile":
+            self._profiler.disable()
+            self._profiler.dump_stats(self.filename(name, ".prof"))
+
+            text = io.StringIO()
+            pstats.Stats(self._profiler, stream=text).sort_stats("cumulative").print_stats(30)
+            with open(self.filename(name, ".txt"), "w") as f:
+                f.write(text.getvalue())
+        else:
+            self._profiler.stop()
+            with open(self.filename(name, ".folded"), "w") as f:
+                f.write(self._profiler.folded())
+        self._profiler = None
+
+        # phase times of the net
+        phases = record["phases"]
+        times = {"grid_build": phases.get("grid_build", {}).get("time", 0.0),
+                 "blockage": sum([phases[p]["time"] for p in BLOCKAGE_PHASES if p in phases]),
+                 "search": phases.get("search", {}).get("time", 0.0)}
+
+        slow = [phase for phase in times if times[phase] > self.threshold[phase]]
+        if slow:
+            logger.warning("Slow net {}: {}".format(name, ", ".join(["{} {:.3f}s".format(p, times[p]) for p in slow])))
+
+        self.nets[name] = {"time": record["time"], "nodes_created": record["nodes_created"],
+                           "nodes_expanded": record["nodes_expanded"], "retries": record["retries"],
+                           **times, "slow": slow}
+        self.write_summary()
+
+        return slow
+
+
+    def abort(self) -> None:
+        """
+        @brief      Stop the profile of a net without dumping it or flagging the net (nothing to do after stop)
+        """
+        if self._profiler is None:
+            return
+
+        if self.mode == "cprofile":
+            self._profiler.disable()
+        else:
+            self._profiler.stop()
+        self._profiler = None
+
+
+    def write_summary(self) -> None:
+        summary = {"threshold": self.threshold,
+                   "slow_nets": [name for name in self.nets if self.nets[name]["slow"]],
+                   "nets": self.nets}
+        with open(os.path.join(self.directory, "slow_nets.json"), "w") as f:
+            json.dump(summary, f, indent=2)
@@ -0,0 +1,205 @@
+from Module.DB import *
+from Device_Router.GridGraph import GridGraph
+from Device_Router.SpatialIndex import ShapeIndex
+from Device_Router.TechRules import tech_rules
+import hashlib
+import os
+import re
+import time
+import numpy as np
+
+
+# files of the cache: the key (sha1) then the suffix of the map, and the temporary files of the writes
+CACHE_FILE = re.compile(r"^([0-9a-f]{40})(_.*)?\.npy(\.\d+\.tmp)?$")
+
+
+def geometry_hash(tech: Tech, circuit: Circuit, total_layers: int=7) -> str:
+    """
+    Hash of the shapes of a circuit seen by the blockage (diffusion, pins and ports) and of the
+    design rules of the blockage.
+    """
+    rules = tech_rules(tech, total_layers)
+    digest = hashlib.sha1()
+    digest.update(repr((rules.unit, rules.pitch_user, rules.spacing, rules.half_width, rules.via_enclosure,
+                        rules.via_half_size, rules.diffusion_spacing, rules.poly_contact_half_width)).encode())
+
+    for inst in circuit.group:
+        if inst == "routing":
+            continue
+        for diff_layer in ["ndiffusion", "pdiffusion"]:
+            for diff in circuit.group[inst].shape.get(diff_layer, []):
+                digest.update(repr((inst, diff_layer, diff.x, diff.y)).encode())
+        for pin in circuit.group[inst].pin:
+            digest.update(repr((inst, pin.net, pin.layer, pin.pt1, pin.pt2)).encode())
+
+    for port in circuit.port:
+        for layer in circuit.port[port].shape:
+            for shape in circuit.port[port].shape[layer]:
+                if hasattr(shape, "x"):
+                    digest.update(repr((port, layer, shape.x, shape.y)).encode())
+
+    return digest.hexdigest()
+
+
+class RasterCache:
+    """
+    Obstacle and vertical block maps of the net grids, saved as .npy files in a directory and
+    mapped (not read) by the later runs and the other worker processes.
+    The maps of a net grid are keyed by the geometry of the circuit, the net, its points, the
+    grid division and the shapes already routed, so a map is only reused for the same blockage.
+    The directory grows with every new blockage unless max_bytes is set (or prune is called):
+    the maps of the least recently used keys are then removed.
+    """
+    def __init__(self, directory: str, tech: Tech, circuit: Circuit, total_layers: int=7, max_bytes: int=None) -> None:
+        """
+        @param      directory     The directory of the map files (created if needed)
+        @param      tech          The technology
+        @param      circuit       The circuit
+        @param      total_layers  The number of routing layers (include poly)
+        @param      max_bytes     The size of the files of the directory, pruned after each save (None: no limit)
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.circuit_key = geometry_hash(tech, circuit, total_layers)
+        self.hits = 0
+        self.misses = 0
+
+
+    def key(self, name: str, points: list, grid_div: int, total_layers: int, index: ShapeIndex) -> str:
+        """
+        The key of the maps of a net grid.
+        @param      name      The net name
+        @param      points    The points to route of each pin group of the net
+        @param      grid_div  The division of the routing pitch of the grid
+        @param      index     The shape index with the shapes already routed
+        """
+        digest = hashlib.sha1()
+        digest.update(repr((self.circuit_key, name, points, grid_div, total_layers, index.routing_digest)).encode())
+        return digest.hexdigest()
+
+
+    def path(self, key: str, suffix: str) -> str:
+        return os.path.join(self.directory, key + suffix + ".npy")
+
+
+    def load(self, key: str, graph: GridGraph) -> bool:
+        """
+        Set the maps of a grid from the files of a key.
+        @return     False if the maps of the key are not saved (or are not those of the grid)
+        """
+        # the layer list is written last: the maps of the key are complete if it exists
+        if not os.path.exists(self.path(key, "")):
+            self.misses += 1
+            return False
+
+        blockage = {}
+        try:
+            for z in np.load(self.path(key, "")).tolist():
+                xs = np.load(self.path(key, "_{}_xs".format(z))).tolist()
+                ys = np.load(self.path(key, "_{}_ys".format(z))).tolist()
+                lay = graph.grid3d[z]
+                if xs != [node.x for node in lay[0]] or ys != [row[0].y for row in lay]:
+                    self.misses += 1
+                    return False
+
+                obstacle = np.load(self.path(key, "_{}_obstacle".format(z)), mmap_mode="r")
+                vertical_block = np.load(self.path(key, "_{}_vertical".format(z)), mmap_mode="r")
+                blockage[z] = (xs, ys, obstacle, vertical_block)
+
+            # the age of the key for prune (least recently used)
+            os.utime(self.path(key, ""))
+        except FileNotFoundError:
+            # pruned by another process
+            self.misses += 1
+            return False
+
+        graph.blockage = blockage
+        self.hits += 1
+        return True
+
+
+    def save(self, key: str, graph: GridGraph) -> None:
+        """
+        Save the maps of a grid (after the blockage, before the grid connection) for a key.
+        """
+        for z in graph.blockage:
+            xs, ys, obstacle, vertical_block = graph.blockage[z]
+            self.write(self.path(key, "_{}_xs".format(z)), np.array(xs, dtype=float))
+            self.write(self.path(key, "_{}_ys".format(z)), np.array(ys, dtype=float))
+            self.write(self.path(key, "_{}_obstacle".format(z)), obstacle)
+            self.write(self.path(key, "_{}_vertical".format(z)), vertical_block)
+        self.write(self.path(key, ""), np.array(sorted(graph.blockage), dtype=int))
+        if self.max_bytes is not None:
+            self.prune(max_bytes=self.max_bytes)
+
+
+    def prune(self, max_bytes: int=None, max_age: float=None) -> int:
+        """
+        Remove the maps of the keys used (saved or loaded) more than max_age seconds ago, then the maps of
+        the least recently used keys until the files of the directory fit in max_bytes (the most recent
+        key is kept). The keys being written by another process (no layer list yet) are only removed by
+        max_age. The grids already mapped keep their maps.
+        @return     The number of keys removed
+        """
+        # files and last use of each key (the layer list, or the newest file of an incomplete key)
+        files = {}
+        used = {}
+        complete = set()
+        for entry in os.scandir(self.directory):
+            match = CACHE_FILE.match(entry.name)
+            if match is None:
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            key = match.group(1)
+            files.setdefault(key, []).append((entry.path, stat.st_size))
+            if entry.name == key + ".npy":
+                complete.add(key)
+                used[key] = stat.st_mtime
+            elif key not in complete:
+                used[key] = max(used.get(key, 0), stat.st_mtime)
+
+        removed = []
+        now = time.time()
+        total = 0
+        for i, key in enumerate(sorted(files, key=lambda k: used[k], reverse=True)):
+            if max_age is not None and now - used[key] > max_age:
+                removed.append(key)
+                continue
+            total += sum([size for _, size in files[key]])
+            if max_bytes is not None and total > max_bytes and i > 0 and key in complete:
+                removed.append(key)
+                total -= sum([size for _, size in files[key]])
+
+        for key in removed:
+            # the layer list first: the loads see the key as missing
+            for path, _ in sorted(files[key], key=lambda f: f[0] != self.path(key, "")):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+        return len(removed)
+
+
+    def clear(self) -> None:
+        """
+        Remove the maps of all the keys (of all the circuits) from the directory.
+        """
+        for entry in os.scandir(self.directory):
+            if CACHE_FILE.match(entry.name) is not None:
+                try:
+                    os.remove(entry.path)
+                except FileNotFoundError:
+                    pass
+
+
+    def write(self, path: str, array: np.ndarray) -> None:
+        # write then rename, so the other processes never map a partial file
+        temp = "{}.{}.tmp".format(path, os.getpid())
+        with open(temp, "wb") as f:
+            np.save(f, array)
+        os.replace(temp, path)
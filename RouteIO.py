@@ -0,0 +1,118 @@
+from Module.DB import *
+import numpy as np
+
+
+def save_routes(tech: Tech, result: dict, path: str, scale: int=1000) -> None:
+    """
+    @brief      Save the routing result of each net as integer arrays (compressed .npz)
+    @param      tech    The technology
+    @param      result  The routing result of each net (maze_routing, eco_rerouting or load_routes)
+    @param      path    The file to write
+    @param      scale   The number of integer steps per user unit of the shape and path coordinates
+
+    Each array has a net index column: the points to route (user units), the trimmed paths and
+    the shapes of each layer (x0, x1, y0, y1).
+    """
+    unit = tech.unit["user"]
+    names = list(result)
+    arrays = {"names": np.array(names, dtype=str),
+              "success": np.array([result[name]["success"] for name in names], dtype=bool),
+              "reason": np.array([result[name]["reason"] or "" for name in names], dtype=str),
+              "scale": np.array(scale)}
+
+    # points to route: (net, group, x, y, z)
+    points = [(i, j) + tuple(pt) for i, name in enumerate(names) for j, group in enumerate(result[name]["points"]) for pt in group]
+    arrays["points"] = np.array(points, dtype=np.int64).reshape(-1, 5)
+
+    # trimmed paths: (net, path, x, y, z)
+    paths = [(i, j, round(pt[0]*scale), round(pt[1]*scale), round(pt[2]))
+             for i, name in enumerate(names) for j, path_pts in enumerate(result[name]["paths"]) for pt in path_pts]
+    arrays["paths"] = np.array(paths, dtype=np.int64).reshape(-1, 5)
+
+    # shapes of each layer: (net, x0, x1, y0, y1)
+    layers = []
+    for name in names:
+        for layer in result[name]["shape"]:
+            if layer not in layers:
+                layers.append(layer)
+    arrays["layers"] = np.array(layers, dtype=str)
+    for layer in layers:
+        boxes = [(i, round(box.x[0]/unit*scale), round(box.x[1]/unit*scale), round(box.y[0]/unit*scale), round(box.y[1]/unit*scale))
+                 for i, name in enumerate(names) for box in result[name]["shape"].get(layer, [])]
+        arrays["shape_" + layer] = np.array(boxes, dtype=np.int64).reshape(-1, 5)
+
+    with open(path, "wb") as f:
+        np.savez_compressed(f, **arrays)
+
+
+def load_routes(tech: Tech, path: str) -> dict:
+    """
+    @brief      Load the routing result saved by save_routes
+    @param      tech  The technology
+    @param      path  The file to read
+    @return     The routing result of each net (points, trimmed paths, shapes, success and reason),
+                without the metrics of the run
+    """
+    unit = tech.unit["user"]
+    with np.load(path) as data:
+        names = data["names"].tolist()
+        scale = int(data["scale"])
+        result = {}
+        for i, name in enumerate(names):
+            result[name] = {"points": [], "paths": [], "shape": {}, "success": bool(data["success"][i]),
+                            "reason": str(data["reason"][i]) or None, "metrics": {}}
+
+        for net, group, x, y, z in data["points"].tolist():
+            points = result[names[net]]["points"]
+            while group >= len(points):
+                points.append([])
+            points[group].append((x, y, z))
+
+        for net, index, x, y, z in data["paths"].tolist():
+            paths = result[names[net]]["paths"]
+            while index >= len(paths):
+                paths.append([])
+            paths[index].append([x/scale, y/scale, float(z)])
+
+        layers = data["layers"].tolist()
+        for name in names:
+            result[name]["shape"] = {layer: [] for layer in layers}
+        for layer in layers:
+            for net, x0, x1, y0, y1 in data["shape_" + layer].tolist():
+                result[names[net]]["shape"][layer].append(Box(layer, [x0/scale*unit, y0/scale*unit], [x1/scale*unit, y1/scale*unit]))
+
+    return result
+
+
+def routing_group(result: dict) -> Group:
+    """
+    @brief      The routing group of a routing result (the shapes of all the nets), e.g. to set as
+                circuit.group["routing"] so the next nets are routed around it
+    """
+    group = Group()
+    group.shape = {}
+    for name in result:
+        for layer in result[name]["shape"]:
+            group.shape.setdefault(layer, []).extend(result[name]["shape"][layer])
+    return group
+
+
+def diff_routes(tech: Tech, old: dict, new: dict, scale: int=1000) -> list:
+    """
+    @brief      The nets routed differently in two routing results (e.g. a saved and a new one)
+    @param      scale  The number of integer steps per user unit the shapes are compared at
+    @return     The names of the nets added, removed, or with different success, points or shapes
+    """
+    step = tech.unit["user"] / scale
+
+    def boxes(result: dict) -> dict:
+        return {layer: sorted((round(box.x[0]/step), round(box.x[1]/step), round(box.y[0]/step), round(box.y[1]/step)) for box in result["shape"][layer])
+                for layer in result["shape"] if result["shape"][layer]}
+
+    changed = []
+    for name in list(old) + [name for name in new if name not in old]:
+        if name not in old or name not in new:
+            changed.append(name)
+        elif old[name]["success"] != new[name]["success"] or old[name]["points"] != new[name]["points"] or boxes(old[name]) != boxes(new[name]):
+            changed.append(name)
+    return changed
@@ -0,0 +1,163 @@
+import json
+import logging
+import os
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:                     # not available on windows
+    resource = None
+
+logger = logging.getLogger("Device_Router")
+
+
+def set_verbose(verbose: bool=True) -> None:
+    """
+    @brief      Print the routing progress messages to stdout (off by default)
+    @param      verbose  True to print, False to be quiet
+    """
+    for handler in [h for h in logger.handlers if getattr(h, "_device_router", False)]:
+        logger.removeHandler(handler)
+
+    if verbose:
+        handler = logging.StreamHandler(sys.stdout)
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        handler._device_router = True
+        logger.addHandler(handler)
+        logger.setLevel(logging.DEBUG)
+    else:
+        logger.setLevel(logging.NOTSET)
+
+
+def peak_memory() -> int:
+    """
+    @brief      Peak resident memory of the process in bytes (0 if unknown)
+    """
+    if resource is None:
+        return 0
+
+    # ru_maxrss is in kilobytes on linux and in bytes on macos
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss if sys.platform == "darwin" else maxrss * 1024
+
+
+def resident_memory() -> int:
+    """
+    @brief      Current resident memory of the process in bytes (the peak if unknown)
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return peak_memory()
+
+
+class RouteMetrics:
+    """
+    Per-net and per-phase measurements of a routing run.
+
+    Each net record holds the wall time, nodes created, nodes expanded, retries and peak memory,
+    and the same measurements for each phase (grid build, blockage passes, connections, search,
+    trim and layout). The records can be emitted as a JSON report or to a callback once a net is done.
+    """
+    def __init__(self, callback=None, trace_memory: bool=False) -> None:
+        """
+        @param      callback      Called with the net record when the net is done
+        @param      trace_memory  Use tracemalloc for the peak memory of each phase (slower),
+                                  otherwise the peak resident memory of the process is reported
+        """
+        self.callback = callback
+        self.trace_memory = trace_memory
+        self.nets = {}
+
+
+    def start_net(self, name: str) -> dict:
+        # a record started and not ended yet is continued (e.g. a mirrored net searched after all)
+        if name in self.nets and "_start" in self.nets[name]:
+            return self.nets[name]
+
+        self.nets[name] = {"net": name, "success": False, "retries": 0, "time": 0.0,
+                           "nodes_created": 0, "nodes_expanded": 0, "peak_memory": 0, "phases": {}}
+        self.nets[name]["_start"] = time.perf_counter()
+        return self.nets[name]
+
+
+    def end_net(self, name: str, success: bool) -> dict:
+        record = self.nets[name]
+        record["success"] = success
+        record["time"] = time.perf_counter() - record.pop("_start")
+        record["peak_memory"] = max([record["peak_memory"]] + [p["peak_memory"] for p in record["phases"].values()])
+
+        if self.callback:
+            self.callback(record)
+
+        return record
+
+
+    @contextmanager
+    def phase(self, name: str, phase: str):
+        """
+        @brief      Measure the wall time and peak memory of a phase of the net (accumulated over retries)
+        """
+        record = self.nets[name]["phases"].setdefault(phase, {"time": 0.0, "calls": 0, "nodes_created": 0,
+                                                               "nodes_expanded": 0, "peak_memory": 0})
+
+        tracing = self.trace_memory and not tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.start()
+        elif self.trace_memory:
+            tracemalloc.reset_peak()
+
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record["time"] += time.perf_counter() - start
+            record["calls"] += 1
+
+            if self.trace_memory:
+                memory = tracemalloc.get_traced_memory()[1]
+                if tracing:
+                    tracemalloc.stop()
+            else:
+                memory = peak_memory()
+            record["peak_memory"] = max(record["peak_memory"], memory)
+
+
+    def count(self, name: str, phase: str, key: str, value: int) -> None:
+        """
+        @brief      Add a counter (nodes_created, nodes_expanded) to the net and its phase
+        """
+        self.nets[name][key] += value
+        self.nets[name]["phases"][phase][key] += value
+
+
+    def report(self) -> dict:
+        """
+        @brief      The records of all nets and the totals of the run
+        """
+        nets = [self.nets[name] for name in self.nets if "_start" not in self.nets[name]]
+        total = {"nets": len(nets),
+                 "failed": sum([not net["success"] for net in nets]),
+                 "time": sum([net["time"] for net in nets]),
+                 "nodes_created": sum([net["nodes_created"] for net in nets]),
+                 "nodes_expanded": sum([net["nodes_expanded"] for net in nets]),
+                 "retries": sum([net["retries"] for net in nets]),
+                 "peak_memory": max([net["peak_memory"] for net in nets], default=0)}
+
+        return {"total": total, "nets": nets}
+
+
+    def to_json(self, path: str=None) -> str:
+        """
+        @brief      JSON report of the run (written to path if given)
+        """
+        text = json.dumps(self.report(), indent=2)
+        if path:
+            with open(path, "w") as f:
+                f.write(text)
+
+        return text
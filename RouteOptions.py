@@ -0,0 +1,98 @@
+from Device_Router.SearchBudget import SearchBudget
+
+
+class RouteOptions:
+    """
+    Options of maze_routing shared by all the nets of a routing run.
+    """
+    def __init__(self, precheck: str="retry", memory_budget: int=None, tile_size: int=64, merge_shapes: bool=True,
+                 raster_cache: str=None, save_routes: str=None, threads: int=1, preferred_direction=None,
+                 global_route: int=None, net_budget: SearchBudget=None, run_budget: SearchBudget=None,
+                 symmetric: list=None, raster_cache_size: int=None) -> None:
+        """
+        @param      precheck  Check that the pins of a net are in the same free-space component before
+                              searching, and skip the search of the grid if not: "always", "retry" (only
+                              on the finer grids after a failed search) or "off" (not on the tiled grids,
+                              the labeling would allocate every tile)
+        @param      memory_budget The memory (bytes) of the grid of a net and of its search state: the grid
+                              is then built as tiles allocated on first access and evicted when unused, and
+                              the net fails if the search state does not fit (None: full grid)
+        @param      tile_size The number of rows and columns of a tile
+        @param      merge_shapes Merge the duplicated, contained and collinear shapes of each routed net
+        @param      raster_cache The directory where the obstacle maps of the net grids are saved, and
+                              mapped by the later runs with the same blockage (None: no cache, the
+                              tiled grids are not cached)
+        @param      save_routes  The file maze_routing saves the routing result to (RouteIO.save_routes)
+        @param      threads   The number of threads routing the pins inside each pin group of a net
+                              (not on the tiled grids)
+        @param      preferred_direction The only planar direction of the moves on each routing layer: a dict
+                              of layer name -> "horizontal" or "vertical", or "alternate" (metal1 horizontal,
+                              metal2 vertical, ... of the routing layers, poly in both directions). A net not
+                              routed with the preferred directions is routed again with all the directions
+                              on the same grid (None: all the directions)
+        @param      global_route The GCell size, in routing pitches (of the widest pitch), of the global routing:
+                              each net is first routed on the GCells, and the search of its grid is confined to
+                              the corridor of GCells found. A net not routed in its corridor is searched again on
+                              the whole grid (None: no global routing, not used by the tiled grids)
+        @param      net_budget The limits of the routing of each net (nodes expanded, time, memory): a net
+                              reaching a limit is failed with the limit as reason, and the next nets are routed
+                              (None: no limit)
+        @param      run_budget The limits of all the nets of a maze_routing call: once reached, the remaining
+                              nets are failed (None: no limit)
+        @param      symmetric The symmetric net pairs (Symmetry.SymmetricPair): the net of a pair routed second
+                              gets the mirror image of the paths of the other net, and is searched only if its
+                              points are not the mirror image of the other net points, or if the mirrored paths
+                              are in its blockage (None: no pairs)
+        @param      raster_cache_size The size (bytes) of the files of the raster cache directory: the maps of the
+                              least recently used grids are removed after each save beyond it (None: no limit)
+        """
+        if precheck not in ["always", "retry", "off"]:
+            raise ValueError("Unknown precheck option: " + precheck)
+
+        if preferred_direction is not None and preferred_direction != "alternate":
+            for layer, direction in preferred_direction.items():
+                if direction not in ["horizontal", "vertical"]:
+                    raise ValueError("Unknown direction of layer " + layer + ": " + str(direction))
+
+        if threads < 1:
+            raise ValueError("Number of threads must be positive: " + str(threads))
+
+        if global_route is not None and global_route < 1:
+            raise ValueError("GCell size must be positive: " + str(global_route))
+
+        nets = [net for pair in symmetric or [] for net in [pair.net, pair.mirror]]
+        if len(set(nets)) != len(nets):
+            raise ValueError("A net is in more than one symmetric pair (or mirrors itself)")
+
+        if raster_cache_size is not None and raster_cache_size <= 0:
+            raise ValueError("Raster cache size must be positive: " + str(raster_cache_size))
+
+        if tile_size < 1:
+            raise ValueError("Tile size must be positive: " + str(tile_size))
+
+        self.precheck = precheck
+        self.memory_budget = memory_budget
+        self.tile_size = tile_size
+        self.merge_shapes = merge_shapes
+        self.raster_cache = raster_cache
+        self.save_routes = save_routes
+        self.threads = threads
+        self.preferred_direction = preferred_direction
+        self.global_route = global_route
+        self.net_budget = net_budget
+        self.run_budget = run_budget
+        self.symmetric = symmetric if symmetric is not None else []
+        self.raster_cache_size = raster_cache_size
+
+
+    def layer_directions(self, routing_layers: int) -> dict:
+        """
+        The preferred direction of each routing layer index (poly: 0, metal1: 1, ...).
+        """
+        if self.preferred_direction is None:
+            return {}
+        if self.preferred_direction == "alternate":
+            return {z: "horizontal" if z % 2 == 1 else "vertical" for z in range(1, routing_layers)}
+
+        layers = ["poly"] + ["metal" + str(z) for z in range(1, routing_layers)]
+        return {z: self.preferred_direction[layer] for z, layer in enumerate(layers) if layer in self.preferred_direction}
@@ -1,100 +1,574 @@
 from Module.DB import *
-from Device_Router.GridGraph import GridGraph
+from Device_Router.GridGraph import GridGraph, TiledGridGraph
 from Device_Router.Maze_Algorithm import *
 from Device_Router.LayoutProcess import Preprocess
-import rdp
+from Device_Router.RouteMetrics import RouteMetrics, logger
+from Device_Router.Profiler import NetProfiler
+from Device_Router.RouteOptions import RouteOptions
+from Device_Router.SpatialIndex import ShapeIndex
+from Device_Router.NetIndex import NetIndex
+from Device_Router.RasterCache import RasterCache
+from Device_Router.RouteIO import save_routes
+from Device_Router.GlobalRoute import GlobalRouter
+from Device_Router.SearchBudget import SearchBudget, BudgetTracker, BudgetExceeded
+from Device_Router.Symmetry import SymmetricPair, mirror_paths, path_conflict
+from concurrent.futures import ThreadPoolExecutor
+from Device_Router.TechRules import tech_rules
 
-def maze_routing(tech: Tech, circuit: Circuit, routing_layers: int) -> None:
+def maze_routing(tech: Tech, circuit: Circuit, routing_layers: int, metrics: RouteMetrics=None,
+                 profiler: NetProfiler=None, route: Preprocess=None, options: RouteOptions=None) -> dict:
     """
     @brief      Maze routing algorithm
     @param      tech     The technology
     @param      circuit  The circuit
+    @param      metrics  The per-net and per-phase measurements to fill (optional)
+    @param      profiler The per-net profiler (optional)
+    @param      route    The preprocess with the design rules of the technology already loaded (optional)
+    @param      options  The routing options (optional)
+    @return     The routing result of each net (points, trimmed paths, shapes, success, reason and metrics)
+    """
+    result = dict(maze_routing_iter(tech, circuit, routing_layers, metrics, profiler, route, options))
+    if options is not None and options.save_routes is not None:
+        save_routes(tech, result, options.save_routes)
+    return result
+
+
+def maze_routing_iter(tech: Tech, circuit: Circuit, routing_layers: int, metrics: RouteMetrics=None,
+                      profiler: NetProfiler=None, route: Preprocess=None, options: RouteOptions=None):
+    """
+    @brief      Maze routing algorithm, yielding the result of each net as soon as it is routed
+    @param      tech     The technology
+    @param      circuit  The circuit
+    @param      metrics  The per-net and per-phase measurements to fill (optional)
+    @param      profiler The per-net profiler (optional)
+    @param      route    The preprocess with the design rules of the technology already loaded (optional)
+    @param      options  The routing options (optional)
+    @return     Generator of (net name, routing result of the net)
+
+    The caller can stop the iteration at any net (e.g. at the first failed net), the
+    remaining nets are then not routed.
     """
     # Initialize 
     circuit.group["routing"] = Group()
-    circuit.group["routing"].shape = {"poly": [], "metal1": [], "metal2": [], "metal3": [], "metal4": [], "metal5": [], "metal6": [],
-                               "contact": [], "via12": [], "via23": [], "via34": [], "via45": [], "via56": []}
-    route = Preprocess(tech)
+    circuit.group["routing"].shape = routing_shape_dict()
+    route = route if route is not None else Preprocess(tech)
+
+    # pins and ports of each net
+    nets = NetIndex(circuit, route.rules)
 
     # pin and port grouping
-    print("Pin Port Grouping")
-    combine_pin_port = route.pin_port_grouping2(circuit)
+    logger.info("Pin Port Grouping")
+    combine_pin_port = route.pin_port_grouping2(circuit, nets)
 
     # find the points to route
-    print("Pin Port Find Points")
-    routing_net = route.pin_port_find_points2(tech, combine_pin_port)
+    logger.info("Pin Port Find Points")
+    routing_net = route.pin_port_find_points2(tech, combine_pin_port, nets)
+
+    # index of the circuit shapes (the routed shapes are added net by net)
+    index = ShapeIndex(tech, circuit, nets=nets)
+    cache = raster_cache(tech, circuit, routing_layers, options)
+    gcells = global_router(tech, routing_layers, options)
+    budget = run_budget(options)
 
-    # route for each net
-    print("Maze Routing for each Net")
+    pairs = symmetric_pairs(options)
+    routed = {}
+
+    # route for each net (the second net of a symmetric pair is mirrored if possible)
+    logger.info("Maze Routing for each Net")
     for name in routing_net:
-        
-        # create grid graph 
+        result = route_or_mirror(tech, circuit, route, routing_layers, name, routing_net[name], pairs, routed,
+                                 metrics, profiler, options, index, cache, gcells, budget)
+        yield name, result
+
+
+def symmetric_pairs(options: RouteOptions=None) -> dict:
+    """
+    @brief      The symmetric pairs of the routing options
+    @return     The dictionary net -> (pair, other net of the pair)
+    """
+    pairs = {}
+    for pair in options.symmetric if options is not None else []:
+        pairs[pair.net] = (pair, pair.mirror)
+        pairs[pair.mirror] = (pair, pair.net)
+    return pairs
+
+
+def route_or_mirror(tech: Tech, circuit: Circuit, route: Preprocess, routing_layers: int, name: str, points: list,
+                    pairs: dict, routed: dict, metrics: RouteMetrics=None, profiler: NetProfiler=None,
+                    options: RouteOptions=None, index: ShapeIndex=None, cache: RasterCache=None,
+                    gcells: GlobalRouter=None, budget: BudgetTracker=None) -> dict:
+    """
+    @brief      Route a net, with the mirror image of the other net of its symmetric pair if that net is
+                already routed (and the mirrored paths are free), otherwise with route_net
+    @param      pairs   The symmetric pairs (symmetric_pairs)
+    @param      routed  The routing results of the nets of the pairs already routed, the result of the net is added
+    @return     The routing result of the net
+    """
+    result = None
+    if name in pairs and pairs[name][1] in routed:
+        pair, other = pairs[name]
+        result = mirror_net(tech, circuit, route, routing_layers, name, points, pair, routed[other], metrics, options, index, gcells)
+    if result is None:
+        result = route_net(tech, circuit, route, routing_layers, name, points, metrics, profiler, options, index, cache, gcells, budget)
+    if name in pairs:
+        routed[name] = result
+    return result
+
+
+def route_net(tech: Tech, circuit: Circuit, route: Preprocess, routing_layers: int, name: str, points: list,
+              metrics: RouteMetrics=None, profiler: NetProfiler=None, options: RouteOptions=None,
+              index: ShapeIndex=None, cache: RasterCache=None, gcells: GlobalRouter=None,
+              run_budget: BudgetTracker=None) -> dict:
+    """
+    @brief      Route a single net against the shapes already in the routing group
+    @param      route   The preprocess (design rules and blockage)
+    @param      name    The net name
+    @param      points  The points to route of each pin group of the net
+    @param      metrics The measurements to fill (optional)
+    @param      profiler The per-net profiler (optional)
+    @param      options The routing options (optional)
+    @param      index   The index of the circuit shapes, the routed shapes of the net are added to it (optional)
+    @param      cache   The saved obstacle maps of the circuit (optional, not used by the tiled grids)
+    @param      gcells  The global routing of the circuit, the routed net is added to its congestion (optional, not used by the tiled grids)
+    @param      run_budget The search budget of the routing run, charged with the net (optional)
+    @return     The routing result of the net
+    """
+    options = options if options is not None else RouteOptions()
+    index = index if index is not None else ShapeIndex(tech, circuit)
+    metrics = metrics if metrics is not None else RouteMetrics()
+    metrics.start_net(name)
+    if profiler:
+        profiler.start(name)
+    try:
+        # search budget of the net (charged to the budget of the run)
+        budget = None
+        if options.net_budget is not None or run_budget is not None:
+            budget = BudgetTracker(options.net_budget if options.net_budget is not None else SearchBudget(), "net", run_budget)
+
+        # create grid graph (with the preferred directions)
         grid_div = 1
-        while True:
-            print("\nNET "+name)
-            print(">> Create Grid Graph")
-            grid = GridGraph(tech, routing_layers)
-            grid.create_grid_graph(routing_net[name], grid_div)
-
-            # obstacle mapping
-            print(">> Obstacle Mapping")
-            route.diffusion_blockage(tech, circuit, grid)
-            route.route_path_blockage(tech, circuit, grid)
-            route.poly_pin_blockage2(tech, circuit, grid, name)
-            route.metal_pin_blockage(tech, circuit, grid, name)
-
-            # maze routing
-            print(">> Grid Connection")
-            grid.grid_connections()
-            
-            # group pin list
-            netlist = []
-            for net in routing_net[name]:
-                # print(net)
-                pinlist = []
-                for pin in net:
-                    node = grid.get_grid_node(pin)
-                    # block vertical routing
-                    node.vertical_block = True
-                    pinlist.append(node)
-                netlist.append(pinlist)
-
-            print(">> Route Multiple Pins Group")
-            paths = route_multi_pins_group(grid.grid3d, netlist)
-            if paths == None and grid_div < 3:
-                print("No path found")
-                grid_div += 1
-                continue
-            
-            break
+        preferred = options.layer_directions(routing_layers)
+        try:
+            while True:
+                if budget is not None:
+                    budget.check()
+                logger.info("\nNET "+name)
+                logger.debug(">> Create Grid Graph")
+                with metrics.phase(name, "grid_build"):
+                    if options.memory_budget is not None:
+                        grid = TiledGridGraph(tech, routing_layers, options.memory_budget, options.tile_size, preferred)
+                    else:
+                        grid = GridGraph(tech, routing_layers, preferred)
+                    grid.create_grid_graph(points, grid_div)
+                metrics.count(name, "grid_build", "nodes_created", grid.node_count())
+                if budget is not None:
+                    budget.check()
+
+                # obstacle mapping (or the maps saved by a previous run with the same blockage)
+                logger.debug(">> Obstacle Mapping")
+                key = None
+                cached = False
+                if cache is not None and options.memory_budget is None:
+                    key = cache.key(name, points, grid_div, routing_layers, index)
+                    with metrics.phase(name, "raster_cache"):
+                        cached = cache.load(key, grid)
+
+                if not cached:
+                    with metrics.phase(name, "diffusion_blockage"):
+                        route.diffusion_blockage(tech, circuit, grid, index)
+                    with metrics.phase(name, "route_path_blockage"):
+                        route.route_path_blockage(tech, circuit, grid, index)
+                    with metrics.phase(name, "poly_pin_blockage"):
+                        route.poly_pin_blockage2(tech, circuit, grid, name, index)
+                    with metrics.phase(name, "metal_pin_blockage"):
+                        route.metal_pin_blockage(tech, circuit, grid, name, index)
+                    with metrics.phase(name, "rasterize"):
+                        grid.rasterize()
+                    if key is not None:
+                        with metrics.phase(name, "raster_cache"):
+                            cache.save(key, grid)
+
+                # global routing: the corridor of the net on the GCells (from the obstacle maps)
+                corridor = None
+                if gcells is not None and options.memory_budget is None:
+                    with metrics.phase(name, "global_route"):
+                        corridor = gcells.corridor(grid, points)
+
+                # maze routing
+                logger.debug(">> Grid Connection")
+                with metrics.phase(name, "grid_connections"):
+                    grid.grid_connections()
+        
+                # group pin list
+                netlist = []
+                for net in points:
+                    # print(net)
+                    pinlist = []
+                    for pin in net:
+                        node = grid.get_grid_node(pin)
+                        # block vertical routing
+                        grid.block_vertical(node)
+                        pinlist.append(node)
+                    netlist.append(pinlist)
+
+                # search (with the preferred directions first, then on the same grid connected in all the directions)
+                while True:
+                    # skip the search if the pins are in different free-space components (not on the tiled grids)
+                    routable = True
+                    precheck = options.precheck == "always" or (options.precheck == "retry" and grid_div > 1)
+                    if precheck and options.memory_budget is None:
+                        with metrics.phase(name, "precheck"):
+                            routable = grid.check_routability(netlist)
+
+                    if routable and budget is not None:
+                        budget.check()
+
+                    if routable:
+                        logger.debug(">> Route Multiple Pins Group")
+                        stats = {"nodes_expanded": 0}
+                        try:
+                            with metrics.phase(name, "search"):
+                                paths = search_net(grid, netlist, stats, options, corridor, budget)
+                                if paths == None and corridor is not None:
+                                    logger.info("No path found in the corridor")
+                                    paths = search_net(grid, netlist, stats, options, budget=budget)
+                        finally:
+                            # also the nodes expanded until a search budget stopped the search
+                            metrics.count(name, "search", "nodes_expanded", stats["nodes_expanded"])
+                        reason = "no path found"
+                    else:
+                        logger.info("Pins in disconnected free space")
+                        paths = None
+                        reason = "pins in disconnected free space"
+
+                    if paths == None and grid.directions:
+                        logger.info("No path found in the preferred directions")
+                        metrics.nets[name]["retries"] += 1
+                        with metrics.phase(name, "grid_connections"):
+                            grid.set_directions({})
+                            grid.grid_connections()
+                        continue
+
+                    break
+
+                if paths == None and grid_div < 3:
+                    logger.info("No path found")
+                    grid_div += 1
+                    metrics.nets[name]["retries"] += 1
+                    continue
         
+                break
+        except BudgetExceeded as exceeded:
+            logger.info(exceeded.reason)
+            paths = None
+            reason = exceeded.reason
+
+        result = {"points": points, "paths": [], "shape": routing_shape_dict(), "success": paths is not None,
+                  "reason": None if paths is not None else reason}
+        if not result["success"]:
+            logger.warning("NET {}: {} after {} grid divisions".format(name, reason, grid_div))
+
         if paths:
-            trim_paths = trim_path(paths)
+            with metrics.phase(name, "trim"):
+                result["paths"] = trim_path(paths)
+            if gcells is not None:
+                gcells.add_paths(paths)
 
             # layout
-            print(">> Layout Generation")
-            route.path_layout(tech, circuit.group["routing"], trim_paths)
+            logger.debug(">> Layout Generation")
+            net_group = Group()
+            net_group.shape = result["shape"]
+            with metrics.phase(name, "layout"):
+                route.path_layout(tech, net_group, result["paths"])
+                if options.merge_shapes:
+                    route.merge_shapes(net_group)
 
+            # add the net shapes to the routing group (blockage of the next nets)
+            for layer in result["shape"]:
+                circuit.group["routing"].shape[layer] += result["shape"][layer]
+            index.add_routing(result["shape"])
 
-def trim_path(paths: list) -> list:
-    # preprocess the path
-    process_paths = []
-    for path in paths:
-        tmp = []
-        for node in path:
-            tmp.append((node.x, node.y, node.z))
-        process_paths.append(tmp)
+        result["metrics"] = metrics.end_net(name, result["success"])
+        if profiler:
+            result["metrics"]["slow"] = profiler.stop(name, result["metrics"])
+    finally:
+        # a net that raised: the profile is stopped, not dumped
+        if profiler:
+            profiler.abort()
+
+    return result
+
+
+def mirror_net(tech: Tech, circuit: Circuit, route: Preprocess, routing_layers: int, name: str, points: list,
+               pair: SymmetricPair, other: dict, metrics: RouteMetrics=None, options: RouteOptions=None,
+               index: ShapeIndex=None, gcells: GlobalRouter=None) -> dict:
+    """
+    @brief      Route a net of a symmetric pair with the mirror image of the other net
+    @param      name    The net name
+    @param      points  The points to route of each pin group of the net
+    @param      pair    The symmetric pair of the net
+    @param      other   The routing result of the other net of the pair
+    @param      index   The index of the circuit shapes, the mirrored shapes are added to it (optional)
+    @param      gcells  The global routing of the circuit, the mirrored net is added to its congestion (optional)
+    @return     The routing result of the net, or None if the other net is not routed, its points are not
+                the mirror image of the points, or the mirrored paths are in the blockage of the net
+    """
+    if not other["success"]:
+        return None
+
+    options = options if options is not None else RouteOptions()
+    index = index if index is not None else ShapeIndex(tech, circuit)
+    metrics = metrics if metrics is not None else RouteMetrics()
+    # the record of the net is continued by route_net if the net is not mirrored
+    metrics.start_net(name)
+
+    logger.info("\nNET "+name)
+    with metrics.phase(name, "mirror"):
+        paths = mirror_paths(pair, other["points"], other["paths"], points, tech.unit["user"])
+        if paths is not None and path_conflict(tech, index, name, paths, routing_layers):
+            logger.info("Mirrored paths in the blockage")
+            paths = None
+    if paths is None:
+        logger.info("Net not mirrored, searching")
+        return None
+
+    result = {"points": points, "paths": paths, "shape": routing_shape_dict(), "success": True, "reason": None}
+
+    # layout
+    net_group = Group()
+    net_group.shape = result["shape"]
+    with metrics.phase(name, "layout"):
+        route.path_layout(tech, net_group, result["paths"])
+        if options.merge_shapes:
+            route.merge_shapes(net_group)
+
+    # add the net shapes to the routing group (blockage of the next nets)
+    for layer in result["shape"]:
+        circuit.group["routing"].shape[layer] += result["shape"][layer]
+    index.add_routing(result["shape"])
+    if gcells is not None:
+        gcells.add_trimmed_paths(result["paths"])
+
+    result["metrics"] = metrics.end_net(name, True)
+    return result
+
+
+def search_net(grid: GridGraph, netlist: list, stats: dict, options: RouteOptions, corridor=None,
+               budget: BudgetTracker=None) -> list:
+    """
+    @brief      Search the paths of the pin groups of a net on its grid
+    @param      netlist  The grid nodes of each pin group
+    @param      corridor The nodes the search is confined to (optional)
+    @param      budget   The search budget of the net (optional)
+    @return     The paths, or None if the pins are not all connected
+    """
+    # the pin groups are routed on a thread pool if the grid is only read by the search
+    if options.threads > 1 and options.memory_budget is None:
+        with ThreadPoolExecutor(options.threads) as pool:
+            return route_multi_pins_group(grid.search_space(), netlist, stats, pool, corridor, budget)
+    return route_multi_pins_group(grid.search_space(), netlist, stats, corridor=corridor, budget=budget)
+
+
+def run_budget(options: RouteOptions=None) -> BudgetTracker:
+    """
+    @brief      The search budget of a routing run (None if the routing options have no run budget)
+    """
+    if options is None or options.run_budget is None:
+        return None
+    return BudgetTracker(options.run_budget, "run", relative_memory=False)
+
+
+def global_router(tech: Tech, routing_layers: int, options: RouteOptions=None) -> GlobalRouter:
+    """
+    @brief      The global routing of a circuit (None if the routing options have no GCell size)
+    """
+    if options is None or options.global_route is None:
+        return None
+    return GlobalRouter(options.global_route * max(tech_rules(tech, routing_layers).pitch_user))
+
+
+def raster_cache(tech: Tech, circuit: Circuit, routing_layers: int, options: RouteOptions=None) -> RasterCache:
+    """
+    @brief      The saved obstacle maps of a circuit (None if the routing options have no cache directory)
+    """
+    if options is None or options.raster_cache is None:
+        return None
+    return RasterCache(options.raster_cache, tech, circuit, routing_layers, options.raster_cache_size)
+
+
+def eco_rerouting(tech: Tech, circuit: Circuit, routing_layers: int, prev_result: dict, moved_insts: list,
+                  metrics: RouteMetrics=None, profiler: NetProfiler=None, options: RouteOptions=None) -> dict:
+    """
+    @brief      Incremental rerouting after some instances are moved
+    @param      tech         The technology
+    @param      circuit      The circuit (with the moved instances)
+    @param      prev_result  The routing result returned by maze_routing (or eco_rerouting)
+    @param      moved_insts  The names of the moved instances in circuit.group
+    @param      metrics      The measurements of the rerouted nets to fill (optional)
+    @param      profiler     The profiler of the rerouted nets (optional)
+    @param      options      The routing options (optional)
+    @return     The routing result of each net
+
+    Only the nets whose pins moved, or whose routed shapes now violate the spacing to the
+    moved geometry, are rerouted. The shapes of the other nets are kept as they are. A rerouted
+    net of a symmetric pair is mirrored from the other net (kept or rerouted before it) as in
+    maze_routing, and the result is saved to options.save_routes.
+    """
+    route = Preprocess(tech)
+
+    # pin and port grouping (with the new pin locations)
+    nets = NetIndex(circuit, route.rules)
+    logger.info("Pin Port Grouping")
+    combine_pin_port = route.pin_port_grouping2(circuit, nets)
+
+    logger.info("Pin Port Find Points")
+    routing_net = route.pin_port_find_points2(tech, combine_pin_port, nets)
+
+    # nets with pins in the moved instances
+    dirty = set()
+    for inst in moved_insts:
+        for pin in circuit.group[inst].pin:
+            dirty.add(pin.net)
+
+    for name in routing_net:
+        # new, failed or moved nets
+        if name not in prev_result or not prev_result[name]["success"] or prev_result[name]["points"] != routing_net[name]:
+            dirty.add(name)
+        # routed shapes colliding with the moved geometry
+        elif eco_collision(tech, circuit, prev_result[name]["shape"], moved_insts, name):
+            dirty.add(name)
+
+    # keep the shapes of the clean nets
+    circuit.group["routing"] = Group()
+    circuit.group["routing"].shape = routing_shape_dict()
+    for name in routing_net:
+        if name not in dirty:
+            for layer in prev_result[name]["shape"]:
+                circuit.group["routing"].shape[layer] += prev_result[name]["shape"][layer]
+
+    # reroute the dirty nets (in the original net order)
+    logger.info("ECO Rerouting: {} of {} nets".format(len(dirty & set(routing_net)), len(routing_net)))
+    index = ShapeIndex(tech, circuit, nets=nets)
+    cache = raster_cache(tech, circuit, routing_layers, options)
+    gcells = global_router(tech, routing_layers, options)
+    budget = run_budget(options)
+    pairs = symmetric_pairs(options)
+    routed = {name: prev_result[name] for name in routing_net if name in pairs and name not in dirty}
+    routing_result = {}
+    for name in routing_net:
+        if name in dirty:
+            routing_result[name] = route_or_mirror(tech, circuit, route, routing_layers, name, routing_net[name], pairs, routed,
+                                                   metrics, profiler, options, index, cache, gcells, budget)
+        else:
+            routing_result[name] = prev_result[name]
+
+    if options is not None and options.save_routes is not None:
+        save_routes(tech, routing_result, options.save_routes)
+    return routing_result
+
+
+def eco_collision(tech: Tech, circuit: Circuit, shape: dict, moved_insts: list, name: str) -> bool:
+    """
+    @brief      Check the routed shapes of a net against the geometry of the moved instances
+    @param      shape        The routed shapes of the net
+    @param      moved_insts  The names of the moved instances
+    @param      name         The net name
+    @return     True if any shape is closer than the min spacing to the moved geometry
+    """
+    def too_close(box: Box, x0: float, y0: float, x1: float, y1: float, spacing: float) -> bool:
+        return box.x[0] < x1 + spacing and box.x[1] > x0 - spacing and box.y[0] < y1 + spacing and box.y[1] > y0 - spacing
+
+    for inst in moved_insts:
+        # pins of the other nets on the same layer
+        for pin in circuit.group[inst].pin:
+            if pin.net == name or pin.layer not in shape:
+                continue
+
+            spacing = tech.min_spacing_rule[(pin.layer, pin.layer)]
+            for box in shape[pin.layer]:
+                if too_close(box, pin.pt1[0], pin.pt1[1], pin.pt2[0], pin.pt2[1], spacing):
+                    return True
+
+        # diffusion against the poly route
+        for diff_layer in ["ndiffusion", "pdiffusion"]:
+            if diff_layer not in circuit.group[inst].shape:
+                continue
+
+            spacing = tech.min_spacing_rule[(diff_layer, "poly")]
+            for diff in circuit.group[inst].shape[diff_layer]:
+                for box in shape["poly"]:
+                    if too_close(box, diff.x[0], diff.y[0], diff.x[1], diff.y[1], spacing):
+                        return True
+
+    return False
+
+
+def routing_shape_dict() -> dict:
+    """
+    @brief      Empty shape dictionary of the routing layers
+    """
+    return {"poly": [], "metal1": [], "metal2": [], "metal3": [], "metal4": [], "metal5": [], "metal6": [],
+            "contact": [], "via12": [], "via23": [], "via34": [], "via45": [], "via56": []}
+
+
+def trim_path(paths: list, epsilon: float=0.2) -> list:
+    """
+    @brief      Keep the end points, bends and layer changes of each path (the paths are rectilinear)
+    @param      paths    The paths of grid nodes
+    @param      epsilon  The coordinate difference (user units) below which two coordinates are the same
+    @return     The trimmed paths as lists of [x, y, z]
+
+    The grid coordinates are not exact (e.g. 1635.0 and 1635.0000000000005), so the moves along
+    such a difference are not bends, and a point at such a distance of the previous one is skipped
+    (the path end is kept).
+    """
+    def direction(pt1: list, pt2: list) -> tuple:
+        return tuple([(b - a > epsilon) - (a - b > epsilon) for a, b in zip(pt1, pt2)])
 
-    # remove the redundant nodes
     trim_path = []
-    for path in process_paths:
-        rdppath = rdp.rdp(path, epsilon=0.2)
-        trim_path.append(rdppath)
+    for path in paths:
+        points = [[float(node.x), float(node.y), float(node.z)] for node in path]
+        if not points:
+            trim_path.append([])
+            continue
+
+        # one pass: keep the previous point when the direction of the move changes
+        trimmed = [points[0]]
+        prev = points[0]
+        heading = None
+        for i in range(1, len(points)):
+            move = direction(prev, points[i])
+            if not any(move):
+                # same point as the previous one
+                if i == len(points)-1:
+                    if trimmed[-1] is prev:
+                        trimmed.append(points[i])
+                    prev = points[i]
+                continue
+
+            if heading is not None and move != heading:
+                trimmed.append(prev)
+            heading = move
+            prev = points[i]
+
+        if trimmed[-1] is not prev:
+            trimmed.append(prev)
+
+        trim_path.append(trimmed)
 
     return trim_path
 
 
-def port_placement(tech: Tech, circuit: Circuit, routing_layers: int) -> None:
+def port_placement(tech: Tech, circuit: Circuit, routing_layers: int, nets: NetIndex=None) -> None:
+    """
+    @brief      Create the text of the ports without one, at the center of a pin of the net
+    @param      tech            The technology
+    @param      circuit         The circuit
+    @param      routing_layers  The number of routing layers
+    @param      nets            The net index of the circuit (optional)
+    """
+    nets = nets if nets is not None else NetIndex(circuit, tech_rules(tech))
+
     # each port
     for port_id in circuit.port:
         curr_port = circuit.port[port_id]
@@ -115,17 +589,13 @@ def port_placement(tech: Tech, circuit: Circuit, routing_layers: int) -> None:
         
         if not port_exist:
            # create port text from pin
-            for group_id in circuit.group:
-                curr_group = circuit.group[group_id]
-                
-                for pin in curr_group.pin:
-                    if pin.net == curr_port.name:
-                        if pin.layer == "poly":
-                            continue
-
-                        # create port text
-                        layer = label[pin.layer]
-                        x = (pin.pt1[0] + pin.pt2[0])/2
-                        y = (pin.pt1[1] + pin.pt2[1])/2
-
-                        circuit.port[port_id].shape[layer] = [Text(layer, [x, y], curr_port.name)]
+            for pin in nets.pins(curr_port.name):
+                if pin.layer == "poly":
+                    continue
+
+                # create port text
+                layer = label[pin.layer]
+                x = (pin.pt1[0] + pin.pt2[0])/2
+                y = (pin.pt1[1] + pin.pt2[1])/2
+
+                circuit.port[port_id].shape[layer] = [Text(layer, [x, y], curr_port.name)]
@@ -0,0 +1,78 @@
+from Device_Router.RouteMetrics import resident_memory
+import threading
+import time
+
+
+class SearchBudget:
+    """
+    Limits of the routing of a net, or of all the nets of a maze_routing call (None: no limit).
+    """
+    def __init__(self, nodes: int=None, seconds: float=None, memory: int=None) -> None:
+        """
+        @param      nodes    The number of nodes expanded by the searches (over all the grid divisions)
+        @param      seconds  The wall time
+        @param      memory   The resident memory (bytes): used by the net (its grids and search state),
+                             or of the process for a maze_routing call
+        """
+        for key, value in [("nodes", nodes), ("seconds", seconds), ("memory", memory)]:
+            if value is not None and value <= 0:
+                raise ValueError("Budget of " + key + " must be positive: " + str(value))
+
+        self.nodes = nodes
+        self.seconds = seconds
+        self.memory = memory
+
+
+class BudgetExceeded(Exception):
+    """
+    A limit of a search budget is reached: the routing of the net is stopped.
+    """
+    def __init__(self, reason: str) -> None:
+        super().__init__(reason)
+        self.reason = reason
+
+
+class BudgetTracker:
+    """
+    Usage of a search budget since its start, shared by the searches of a net (and of the
+    nets of a run with the parent tracker) on any thread.
+    """
+    def __init__(self, budget: SearchBudget, scope: str, parent: "BudgetTracker"=None, relative_memory: bool=True) -> None:
+        """
+        @param      budget   The limits
+        @param      scope    The name of the budget in the failure reasons ("net", "run")
+        @param      parent   The tracker of the enclosing budget, also charged and checked (optional)
+        @param      relative_memory  Limit the memory used since the start, otherwise the memory of the process
+        """
+        self.budget = budget
+        self.scope = scope
+        self.parent = parent
+        self.expanded = 0
+        self.start = time.perf_counter()
+        self.base_memory = resident_memory() if relative_memory else 0
+        self.lock = threading.Lock()
+
+
+    def expand(self, count: int) -> None:
+        """
+        Add expanded nodes to the usage.
+        """
+        with self.lock:
+            self.expanded += count
+        if self.parent is not None:
+            self.parent.expand(count)
+
+
+    def check(self) -> None:
+        """
+        Raise BudgetExceeded if a limit is reached (of this budget or of the parent).
+        """
+        budget = self.budget
+        if budget.nodes is not None and self.expanded > budget.nodes:
+            raise BudgetExceeded("{} node budget exceeded ({} nodes expanded)".format(self.scope, self.expanded))
+        if budget.seconds is not None and time.perf_counter() - self.start > budget.seconds:
+            raise BudgetExceeded("{} time budget exceeded ({} s)".format(self.scope, budget.seconds))
+        if budget.memory is not None and resident_memory() - self.base_memory > budget.memory:
+            raise BudgetExceeded("{} memory budget exceeded ({} bytes)".format(self.scope, budget.memory))
+        if self.parent is not None:
+            self.parent.check()
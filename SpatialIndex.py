@@ -0,0 +1,116 @@
+from Module.DB import *
+from Device_Router.NetIndex import NetIndex
+import hashlib
+import math
+
+
+class ShapeIndex:
+    """
+    Uniform-bin index of the shapes of a circuit (diffusion, pins, ports and routed shapes),
+    by kind and layer, so the blockage of a net only visits the shapes near its grid.
+    The queries return the shapes in the order they were added (the order of the circuit).
+    """
+    def __init__(self, tech: Tech, circuit: Circuit, bin_size: int=2000, nets: NetIndex=None) -> None:
+        """
+        @param      tech      The technology
+        @param      circuit   The circuit
+        @param      bin_size  The size of the bins in user units
+        @param      nets      The net index of the circuit, with the pin rectangles (optional)
+        """
+        self.unit = tech.unit["user"]
+        self.bin_size = bin_size
+        self.entries = []           # (bounds, net, item) in the order of addition
+        self.bins = {}              # (kind, layer) -> {(bin x, bin y): [entry index]}
+        self.routing_digest = ""    # hash of the routed shapes added so far
+
+        # diffusion shapes (all the ndiffusion, then all the pdiffusion)
+        for diff_layer in ["ndiffusion", "pdiffusion"]:
+            for inst in circuit.group:
+                if diff_layer in circuit.group[inst].shape:
+                    for diff in circuit.group[inst].shape[diff_layer]:
+                        self.add("diffusion", diff_layer, diff.x[0], diff.x[1], diff.y[0], diff.y[1], None, diff)
+
+        # pins of the instances
+        if nets is not None:
+            for pin in nets.all_pins:
+                self.insert("pin", pin.layer, nets.rect[id(pin)], pin.net, pin)
+        else:
+            for inst in circuit.group:
+                for pin in circuit.group[inst].pin:
+                    self.add("pin", pin.layer, pin.pt1[0], pin.pt2[0], pin.pt1[1], pin.pt2[1], pin.net, pin)
+
+        # ports
+        for port in circuit.port:
+            for layer in circuit.port[port].shape:
+                for shape in circuit.port[port].shape[layer]:
+                    self.add("port", layer, shape.x[0], shape.x[1], shape.y[0], shape.y[1], port, shape)
+
+        # shapes already routed
+        if "routing" in circuit.group:
+            self.add_routing(circuit.group["routing"].shape)
+
+
+    def add(self, kind: str, layer: str, x0: float, x1: float, y0: float, y1: float, net: str, item) -> None:
+        # bounds in user units
+        bounds = (round(x0 / self.unit), round(x1 / self.unit), round(y0 / self.unit), round(y1 / self.unit))
+        self.insert(kind, layer, bounds, net, item)
+
+
+    def insert(self, kind: str, layer: str, bounds: tuple, net: str, item) -> None:
+        """
+        Add a shape with its (x0, x1, y0, y1) bounds already in user units.
+        """
+        index = len(self.entries)
+        self.entries.append((bounds, net, item))
+
+        bins = self.bins.setdefault((kind, layer), {})
+        for bx in range(bounds[0] // self.bin_size, bounds[1] // self.bin_size + 1):
+            for by in range(bounds[2] // self.bin_size, bounds[3] // self.bin_size + 1):
+                bins.setdefault((bx, by), []).append(index)
+
+
+    def add_routing(self, shape: dict) -> None:
+        """
+        Add the routed shapes of a net (shape dictionary of the routing layers).
+        """
+        added = []
+        for layer in shape:
+            for box in shape[layer]:
+                self.add("routing", layer, box.x[0], box.x[1], box.y[0], box.y[1], None, box)
+                added.append((layer, self.entries[-1][0]))
+
+        self.routing_digest = hashlib.sha1(repr((self.routing_digest, added)).encode()).hexdigest()
+
+
+    def query(self, kind: str, layer: str, window: tuple, margin: int=0) -> list:
+        """
+        The shapes of a kind and layer intersecting a window (bounds included).
+        @param      window  The (x0, x1, y0, y1) window in user units
+        @param      margin  The distance (user units) the window is extended by
+        @return     The list of (net, shape) in the order of addition
+        """
+        bins = self.bins.get((kind, layer))
+        if not bins:
+            return []
+
+        x0 = math.floor(window[0]) - margin
+        x1 = math.ceil(window[1]) + margin
+        y0 = math.floor(window[2]) - margin
+        y1 = math.ceil(window[3]) + margin
+
+        # bins of the window (or all the bins if the window covers more bins than the layer has)
+        bx0, bx1 = x0 // self.bin_size, x1 // self.bin_size
+        by0, by1 = y0 // self.bin_size, y1 // self.bin_size
+        if (bx1 - bx0 + 1) * (by1 - by0 + 1) > len(bins):
+            keys = [key for key in bins if bx0 <= key[0] <= bx1 and by0 <= key[1] <= by1]
+        else:
+            keys = [(bx, by) for bx in range(bx0, bx1 + 1) for by in range(by0, by1 + 1) if (bx, by) in bins]
+
+        found = set()
+        for key in keys:
+            for index in bins[key]:
+                bounds = self.entries[index][0]
+                if bounds[0] <= x1 and bounds[1] >= x0 and bounds[2] <= y1 and bounds[3] >= y0:
+                    found.add(index)
+
+        return [self.entries[index][1:] for index in sorted(found)]
@@ -0,0 +1,119 @@
+from Module.DB import *
+from Device_Router.SpatialIndex import ShapeIndex
+from Device_Router.TechRules import ROUTE_LAYERS, tech_rules
+
+
+class SymmetricPair:
+    """
+    Two nets routed as mirror images about an axis: the net routed first is searched, the
+    other one gets its mirrored paths if they are free in its blockage.
+    """
+    def __init__(self, net: str, mirror: str, axis: float, orientation: str="vertical") -> None:
+        """
+        @param      net          The name of a net of the pair
+        @param      mirror       The name of the other net
+        @param      axis         The coordinate of the symmetry axis (DB units, as the circuit shapes)
+        @param      orientation  "vertical" (the axis is x = axis) or "horizontal" (the axis is y = axis)
+        """
+        if orientation not in ["vertical", "horizontal"]:
+            raise ValueError("Unknown orientation of the symmetry axis: " + str(orientation))
+
+        self.net = net
+        self.mirror = mirror
+        self.axis = axis
+        self.orientation = orientation
+
+
+    def reflect(self, pt: tuple, unit: float) -> tuple:
+        """
+        The mirror image of a (x, y, z) point in user units.
+        """
+        # twice the axis, rounded to user units (an axis between two grid coordinates stays exact)
+        axis2 = round(2 * self.axis / unit)
+        if self.orientation == "vertical":
+            return (axis2 - pt[0], pt[1], pt[2])
+        return (pt[0], axis2 - pt[1], pt[2])
+
+
+def mirror_paths(pair: SymmetricPair, points: list, paths: list, mirror_points: list, unit: float) -> list:
+    """
+    The mirror image of the trimmed paths of a net of a pair.
+    @param      points         The points to route of the routed net
+    @param      paths          The trimmed paths of the routed net
+    @param      mirror_points  The points to route of the other net
+    @param      unit           The user unit
+    @return     The mirrored paths, or None if the points of the other net are not the mirror image of the points
+    """
+    reflected = sorted([pair.reflect(pt, unit) for group in points for pt in group])
+    if reflected != sorted([pt for group in mirror_points for pt in group]):
+        return None
+    return [[list(pair.reflect(pt, unit)) for pt in path] for path in paths]
+
+
+def path_conflict(tech: Tech, index: ShapeIndex, name: str, paths: list, total_layers: int=7) -> bool:
+    """
+    Check trimmed paths against the blockage of a net, without a grid: the wires against the
+    obstacle rectangles of their layer, and the vias against the obstacle and vertical block
+    rectangles of the layers they cross (the rectangles of diffusion_blockage, poly_pin_blockage2,
+    metal_pin_blockage and route_path_blockage, the pins of the net itself excluded).
+    @param      index  The index of the circuit shapes with the shapes already routed
+    @param      name   The net of the paths
+    @return     True if a wire or a via is in the blockage
+    """
+    rules = tech_rules(tech, total_layers)
+    unit = tech.unit["user"]
+    points = [pt for path in paths for pt in path]
+    if not points:
+        return False
+    window = (min([pt[0] for pt in points]), max([pt[0] for pt in points]), min([pt[1] for pt in points]), max([pt[1] for pt in points]))
+
+    def user_box(x0: float, x1: float, y0: float, y1: float) -> tuple:
+        return (round(x0 / unit), round(x1 / unit), round(y0 / unit), round(y1 / unit))
+
+    # obstacle and vertical block rectangles of each layer near the paths
+    obstacle = {}
+    vertical = {}
+    for z in range(total_layers):
+        layer = ROUTE_LAYERS[z]
+        spacing = rules.spacing[layer] + rules.half_width[layer]
+        via_spacing = rules.spacing[layer] + rules.via_enclosure[layer] + rules.via_half_size[layer]
+        margin = max(spacing, via_spacing)
+
+        boxes = [user_box(shp.x[0], shp.x[1], shp.y[0], shp.y[1]) for _, shp in index.query("routing", layer, window, margin)]
+        boxes += [user_box(pin.pt1[0], pin.pt2[0], pin.pt1[1], pin.pt2[1]) for net, pin in index.query("pin", layer, window, margin) if net != name]
+        if layer == "metal1":
+            boxes += [user_box(shp.x[0], shp.x[1], shp.y[0], shp.y[1]) for port, shp in index.query("port", layer, window, margin) if port != name]
+
+        obstacle[z] = [(x0 - spacing, x1 + spacing, y0 - spacing, y1 + spacing) for x0, x1, y0, y1 in boxes]
+        vertical[z] = [(x0 - via_spacing, x1 + via_spacing, y0 - via_spacing, y1 + via_spacing) for x0, x1, y0, y1 in boxes]
+
+        if z == 0:
+            for diff_layer in ["ndiffusion", "pdiffusion"]:
+                df_spacing = rules.diffusion_spacing[diff_layer] + rules.poly_contact_half_width
+                for _, diff in index.query("diffusion", diff_layer, window, df_spacing):
+                    x0, x1, y0, y1 = user_box(diff.x[0], diff.x[1], diff.y[0], diff.y[1])
+                    rect = (x0 - df_spacing, x1 + df_spacing, y0 - df_spacing, y1 + df_spacing)
+                    obstacle[z].append(rect)
+                    vertical[z].append(rect)
+
+    def hit(rects: list, x0: float, x1: float, y0: float, y1: float) -> bool:
+        # rectangles with the bounds included, as on the grid
+        return any([r[0] <= x1 and r[1] >= x0 and r[2] <= y1 and r[3] >= y0 for r in rects])
+
+    for path in paths:
+        for pt1, pt2 in zip(path[:-1], path[1:]):
+            x0, x1 = min(pt1[0], pt2[0]), max(pt1[0], pt2[0])
+            y0, y1 = min(pt1[1], pt2[1]), max(pt1[1], pt2[1])
+            z0, z1 = int(min(pt1[2], pt2[2])), int(max(pt1[2], pt2[2]))
+
+            # wire
+            if z0 == z1:
+                if hit(obstacle[z0], x0, x1, y0, y1):
+                    return True
+            # via (stacked through the layers in between)
+            else:
+                for z in range(z0, z1 + 1):
+                    if hit(obstacle[z], x0, x1, y0, y1) or hit(vertical[z], x0, x1, y0, y1):
+                        return True
+
+    return False
@@ -0,0 +1,127 @@
+from Module.DB import *
+import math
+import weakref
+
+# routing layers and the via layer of each (the via to the layer above, the top layer uses the via below)
+ROUTE_LAYERS = ["poly", "metal1", "metal2", "metal3", "metal4", "metal5", "metal6"]
+ROUTE_VIA = {"poly": "contact", "metal1": "via12", "metal2": "via23", "metal3": "via34", "metal4": "via45",
+             "metal5": "via56", "metal6": "via56"}
+
+# rule tables already built: tech -> {routing layers: rules}, dropped with the tech
+_cache = weakref.WeakKeyDictionary()
+
+
+class TechRules:
+    """
+    Design rules of a technology used by the router, computed once per (Tech, routing layers).
+
+    The layer maps and the grid pitch are those of the routing layers. The blockage rules are
+    in integer user units (truncated as the blockage has always used them), for all the routing
+    layers. The layout rules are in database units, as the layout shapes are.
+    The table is read-only and picklable (it can be sent to the worker processes).
+    """
+    def __init__(self, tech: Tech, total_layers: int=7) -> None:
+        unit = tech.unit["user"]
+        self.total_layers = total_layers
+
+        # layer maps and routing pitch (database and user units)
+        self.rt_layer2int = {}
+        self.int2rt_layer = {}
+        self.via_layer2int = {}
+        self.int2via_layer = {}
+        self.pitch = []
+        self.pitch_user = []
+
+        for layer_idx in range(total_layers):
+            # poly layer
+            if layer_idx == 0:
+                min_width = tech.min_width_rule["poly"]
+                min_spacing = tech.min_spacing_rule[("poly","poly")]
+
+                self.rt_layer2int["poly"] = layer_idx
+                self.int2rt_layer[layer_idx] = "poly"
+                self.via_layer2int["contact"] = layer_idx
+                self.int2via_layer[layer_idx] = "contact"
+
+            # metal layer
+            else:
+                # check the min width and min spacing exist
+                if "metal"+str(layer_idx) not in tech.min_width_rule or ("metal"+str(layer_idx),"metal"+str(layer_idx)) not in tech.min_spacing_rule:
+                    print("Error: metal"+str(layer_idx)+" min width or min spacing is not defined.")
+                    exit(1)
+
+                min_width = tech.min_width_rule["metal"+str(layer_idx)]
+                min_spacing = tech.min_spacing_rule[("metal"+str(layer_idx),"metal"+str(layer_idx))]
+                self.rt_layer2int["metal"+str(layer_idx)] = layer_idx
+                self.int2rt_layer[layer_idx] = "metal"+str(layer_idx)
+                self.via_layer2int["via"+str(layer_idx)+str(layer_idx+1)] = layer_idx
+                self.int2via_layer[layer_idx] = "via"+str(layer_idx)+str(layer_idx+1)
+
+            self.pitch.append(min_width + min_spacing)
+            self.pitch_user.append((min_width + min_spacing)/unit)
+
+        # blockage rules (user units) of each routing layer
+        self.spacing = {}           # spacing to the same layer
+        self.half_width = {}        # half min width
+        self.via_enclosure = {}     # enclosure of the via of the layer
+        self.via_half_size = {}     # half size of the via of the layer
+        for layer in ROUTE_LAYERS:
+            self.spacing[layer] = int(tech.min_spacing_rule[(layer,layer)]/unit)
+            self.half_width[layer] = int(tech.min_width_rule[layer]/2 /unit)
+            self.via_enclosure[layer] = int(tech.min_enclosure_rule[layer,ROUTE_VIA[layer]]/unit)
+            self.via_half_size[layer] = int(tech.min_size_rule[ROUTE_VIA[layer]]/2 /unit)
+
+        # diffusion to poly spacing (user units), and the half width of a poly with a contact
+        self.diffusion_spacing = {}
+        for diff_layer in ["ndiffusion", "pdiffusion"]:
+            self.diffusion_spacing[diff_layer] = int(tech.min_spacing_rule[(diff_layer,"poly")]/unit)
+        self.poly_contact_half_width = int((tech.min_size_rule["contact"] + tech.min_enclosure_rule["poly","contact"])/2 /unit)
+
+        # layout rules (database units)
+        self.unit = unit
+        self.min_width = {layer: tech.min_width_rule[layer] for layer in ROUTE_LAYERS}
+        self.min_spacing = {layer: tech.min_spacing_rule[(layer,layer)] for layer in ROUTE_LAYERS}
+        self.via_size = {}
+        self.landing_width = {}     # (layer, via) -> width of the via landing
+        self.landing_width_eol = {} # (layer, via) -> length of the via landing (end of line enclosure)
+        self.stack_width_wide = {}  # (layer, via) -> length of a stacked via landing (min area)
+        for i, layer in enumerate(ROUTE_LAYERS):
+            # vias above and below the layer (only the rules defined by the technology)
+            for via_layer in [ROUTE_VIA[layer]] + ([ROUTE_VIA[ROUTE_LAYERS[i-1]]] if i > 0 else []):
+                if via_layer not in tech.min_size_rule:
+                    continue
+                self.via_size[via_layer] = tech.min_size_rule[via_layer]
+
+                if (layer, via_layer) in tech.min_enclosure_rule:
+                    self.landing_width[layer, via_layer] = tech.min_size_rule[via_layer] + 2*tech.min_enclosure_rule[layer, via_layer]
+                if (layer, via_layer, "end") not in tech.min_enclosure_rule:
+                    continue
+                self.landing_width_eol[layer, via_layer] = tech.min_size_rule[via_layer] + 2*tech.min_enclosure_rule[layer, via_layer, "end"]
+                if layer in tech.min_area_rule:
+                    width_wide = tech.min_area_rule[layer] / self.landing_width_eol[layer, via_layer]
+                    self.stack_width_wide[layer, via_layer] = math.ceil(width_wide / 2 / tech.unit["grid"]) * 2 * tech.unit["grid"]
+
+        self._frozen = True
+
+
+    def __setattr__(self, name: str, value) -> None:
+        if getattr(self, "_frozen", False):
+            raise AttributeError("TechRules is read-only")
+        super().__setattr__(name, value)
+
+
+def tech_rules(tech: Tech, total_layers: int=7) -> TechRules:
+    """
+    The rule table of a technology (built on the first call, then shared).
+    """
+    rules = _cache.setdefault(tech, {})
+    if total_layers not in rules:
+        rules[total_layers] = TechRules(tech, total_layers)
+    return rules[total_layers]
+
+
+def share_rules(tech: Tech, rules: TechRules) -> None:
+    """
+    Use a rule table built elsewhere (e.g. sent to a worker process) for a technology.
+    """
+    _cache.setdefault(tech, {})[rules.total_layers] = rules
@@ -1,2 +1,8 @@
 from Device_Router.GridGraph import *
-from Device_Router.Router import *
\ No newline at end of file
+from Device_Router.Router import *
+from Device_Router.RouteMetrics import RouteMetrics, set_verbose
+from Device_Router.Profiler import NetProfiler
+from Device_Router.Batch import route_batch
+from Device_Router.RouteOptions import RouteOptions
+from Device_Router.SearchBudget import SearchBudget
+from Device_Router.Symmetry import SymmetricPair
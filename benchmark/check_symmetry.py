@@ -0,0 +1,65 @@
+"""
+Check of the symmetric net routing on mirrored synthetic device rows.
+
+Each case routes a row of devices and its mirror image with the symmetric pairs P/N and GL/GR,
+and checks that the second net of each pair is mirrored (not searched) and is the mirror image
+of the first one. The axes are in nm, including axes that are not exact in floating point
+(e.g. 1000e-9 / 1e-9).
+
+    python benchmark/check_symmetry.py --devices 2 3 --axes 1000 1200 2100 7300
+"""
+import argparse
+import sys
+
+from run_benchmark import RouteMetrics, RouteOptions, maze_routing, stub_db
+from synthetic import make_symmetric_circuit
+from Device_Router.Symmetry import SymmetricPair
+
+
+def check_case(devices: int, axis: int, layers: int=7) -> list:
+    """
+    @brief      Route a mirrored row with the symmetric pairs
+    @return     The list of errors (empty if the pairs are mirrored)
+    """
+    u = 1e-9
+    circuit = make_symmetric_circuit(devices, axis)
+    pairs = [SymmetricPair("P", "N", axis*u), SymmetricPair("GL", "GR", axis*u)]
+    metrics = RouteMetrics()
+    result = maze_routing(stub_db.Tech(), circuit, layers, metrics, options=RouteOptions(symmetric=pairs))
+
+    errors = []
+    for pair in pairs:
+        if not result[pair.net]["success"] or not result[pair.mirror]["success"]:
+            errors.append("{}/{} not routed".format(pair.net, pair.mirror))
+            continue
+
+        record = metrics.nets[pair.mirror]
+        if "search" in record["phases"]:
+            errors.append("{} searched instead of mirrored".format(pair.mirror))
+
+        mirrored = sorted([(axis - pt[0] + axis, pt[1], pt[2]) for path in result[pair.net]["paths"] for pt in path])
+        paths = sorted([tuple(pt) for path in result[pair.mirror]["paths"] for pt in path])
+        if mirrored != paths:
+            errors.append("{} is not the mirror image of {}".format(pair.mirror, pair.net))
+
+    return errors
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Check the symmetric net routing on mirrored device rows.")
+    parser.add_argument("--devices", type=int, nargs="+", default=[2, 3], help="number of devices on each side")
+    parser.add_argument("--axes", type=int, nargs="+", default=[1000, 1200, 2100, 7300], help="axis x-coordinates (nm)")
+    args = parser.parse_args()
+
+    failed = 0
+    for devices in args.devices:
+        for axis in args.axes:
+            errors = check_case(devices, axis)
+            print("{:>3} devices, axis {:>6} nm: {}".format(devices, axis, "; ".join(errors) if errors else "ok"))
+            failed += bool(errors)
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
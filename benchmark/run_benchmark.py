@@ -0,0 +1,180 @@
+"""
+Benchmark of the routing pipeline on synthetic device arrays.
+
+Each case routes a synthetic circuit and records the time of each phase of maze_routing
+(create_grid_graph, the Preprocess blockage passes, grid_connections, route_multi_pins_group,
+trim_path and path_layout). The results are appended to a JSON lines file keyed by the
+router version, so the runs of different versions can be compared.
+
+    python benchmark/run_benchmark.py --devices 4 16 --nets 4 --pins 3
+    python benchmark/run_benchmark.py --compare
+"""
+import argparse
+import importlib.util
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+import stub_db
+stub_db.install()
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# import the router as the Device_Router package (whatever the name of the checkout)
+if "Device_Router" not in sys.modules:
+    spec = importlib.util.spec_from_file_location("Device_Router", os.path.join(ROOT, "__init__.py"),
+                                                  submodule_search_locations=[ROOT])
+    package = importlib.util.module_from_spec(spec)
+    sys.modules["Device_Router"] = package
+    spec.loader.exec_module(package)
+
+from Device_Router.Router import maze_routing
+from Device_Router.RouteMetrics import RouteMetrics
+from Device_Router.RouteOptions import RouteOptions
+from synthetic import make_circuit
+
+# metrics phase -> pipeline step
+PHASES = {"grid_build": "create_grid_graph",
+          "diffusion_blockage": "diffusion_blockage",
+          "route_path_blockage": "route_path_blockage",
+          "poly_pin_blockage": "poly_pin_blockage2",
+          "metal_pin_blockage": "metal_pin_blockage",
+          "rasterize": "rasterize",
+          "raster_cache": "raster_cache",
+          "global_route": "global_route",
+          "mirror": "mirror",
+          "grid_connections": "grid_connections",
+          "precheck": "check_routability",
+          "search": "route_multi_pins_group",
+          "trim": "trim_path",
+          "layout": "path_layout"}
+
+
+def router_version() -> str:
+    """
+    @brief      The git commit of the router (with a + if the tree is modified)
+    """
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+        return commit + ("+" if dirty else "")
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run_case(devices: int, nets: int, pins: int, layers: int, seed: int, repeat: int, options: RouteOptions=None) -> dict:
+    """
+    @brief      Route a synthetic circuit and time each phase (best of the repeats)
+    """
+    best = None
+    for _ in range(repeat):
+        circuit = make_circuit(devices, nets, pins, seed)
+        metrics = RouteMetrics()
+
+        start = time.perf_counter()
+        maze_routing(stub_db.Tech(), circuit, layers, metrics, options=options)
+        total = time.perf_counter() - start
+
+        report = metrics.report()
+        phases = {step: 0.0 for step in PHASES.values()}
+        for net in report["nets"]:
+            for phase in net["phases"]:
+                phases[PHASES[phase]] += net["phases"][phase]["time"]
+        phases["grouping"] = total - sum(phases.values())
+
+        run = {"total": total, "phases": phases,
+               "nodes_created": report["total"]["nodes_created"],
+               "nodes_expanded": report["total"]["nodes_expanded"],
+               "retries": report["total"]["retries"],
+               "failed": report["total"]["failed"],
+               "peak_memory": report["total"]["peak_memory"]}
+
+        if best is None:
+            best = run
+        else:
+            best["total"] = min(best["total"], run["total"])
+            for step in best["phases"]:
+                best["phases"][step] = min(best["phases"][step], run["phases"][step])
+
+    return best
+
+
+def compare(records: list) -> None:
+    """
+    @brief      Print the time of the latest version against the previous version of each case
+    """
+    cases = {}
+    for record in records:
+        key = json.dumps(record["case"], sort_keys=True)
+        cases.setdefault(key, []).append(record)
+
+    for key in cases:
+        versions = {}
+        for record in cases[key]:
+            versions[record["version"]] = record        # the latest record of each version
+        if len(versions) < 2:
+            continue
+
+        prev, curr = list(versions.values())[-2:]
+        print("case {}: {} -> {}".format(key, prev["version"], curr["version"]))
+        for step in ["total"] + list(curr["phases"]):
+            t0 = prev["total"] if step == "total" else prev["phases"].get(step, 0.0)
+            t1 = curr["total"] if step == "total" else curr["phases"][step]
+            ratio = t1 / t0 if t0 else float("inf")
+            print("  {:<24} {:10.4f}s {:10.4f}s  x{:.2f}".format(step, t0, t1, ratio))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the routing pipeline on synthetic device arrays.")
+    parser.add_argument("--devices", type=int, nargs="+", default=[4, 16], help="number of devices")
+    parser.add_argument("--nets", type=int, nargs="+", default=[4], help="number of nets")
+    parser.add_argument("--pins", type=int, nargs="+", default=[3], help="pins per net")
+    parser.add_argument("--layers", type=int, nargs="+", default=[7], help="routing layers (including poly)")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the pin assignment")
+    parser.add_argument("--repeat", type=int, default=3, help="repeats of each case (best time is kept)")
+    parser.add_argument("--memory-budget", type=int, default=None, help="memory budget (bytes) of the tiled grid of each net")
+    parser.add_argument("--tile-size", type=int, default=64, help="rows and columns of a tile of the tiled grid")
+    parser.add_argument("--global-route", type=int, default=None, help="GCell size (routing pitches) of the global routing")
+    parser.add_argument("--preferred-direction", default=None, choices=["alternate"], help="preferred direction of the routing layers")
+    parser.add_argument("--label", default="", help="label stored with the results")
+    parser.add_argument("--output", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "results.jsonl"),
+                        help="JSON lines file the results are appended to")
+    parser.add_argument("--compare", action="store_true", help="compare the last two versions in the output file and exit")
+    args = parser.parse_args()
+
+    if args.compare:
+        with open(args.output) as f:
+            compare([json.loads(line) for line in f if line.strip()])
+        return
+
+    version = router_version()
+    options = RouteOptions(memory_budget=args.memory_budget, tile_size=args.tile_size, global_route=args.global_route,
+                           preferred_direction=args.preferred_direction)
+    for devices, nets, pins, layers in itertools.product(args.devices, args.nets, args.pins, args.layers):
+        if nets * pins > 3 * devices:
+            print("skip: {} nets of {} pins in {} devices".format(nets, pins, devices))
+            continue
+
+        case = {"devices": devices, "nets": nets, "pins": pins, "layers": layers, "seed": args.seed}
+        if args.preferred_direction is not None:
+            case["preferred_direction"] = args.preferred_direction
+        if args.memory_budget is not None:
+            case["memory_budget"] = args.memory_budget
+            case["tile_size"] = args.tile_size
+        result = run_case(devices, nets, pins, layers, args.seed, args.repeat, options)
+        record = {"version": version, "label": args.label, "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                  "python": platform.python_version(), "case": case, **result}
+
+        with open(args.output, "a") as f:
+            f.write(json.dumps(record) + "\n")
+
+        print("{:>4} devices {:>4} nets {:>3} pins {} layers: {:8.3f}s  ({} nodes expanded, {} failed)".format(
+            devices, nets, pins, layers, result["total"], result["nodes_expanded"], result["failed"]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Lightweight stand-in for Module.DB (Tech, Circuit, Group, Pin, Port, Box, Text).
+
+Only the attributes used by the router are modelled, so the routing pipeline can be
+measured without the full AutoALG database and a real PDK.
+"""
+import sys
+import types
+
+
+class Tech:
+    """
+    Synthetic technology, all rules in meters and user unit of 1nm.
+    Every routing layer has the same pitch, so the grids of all layers are aligned.
+    """
+    def __init__(self, layers: int=7, width: float=70e-9, spacing: float=70e-9) -> None:
+        self.unit = {"user": 1e-9, "grid": 5e-9}
+
+        metal = ["poly"] + ["metal"+str(i) for i in range(1, 7)]
+        via = ["contact", "via12", "via23", "via34", "via45", "via56"]
+
+        self.min_width_rule = {}
+        self.min_spacing_rule = {("ndiffusion","poly"): 50e-9, ("pdiffusion","poly"): 50e-9}
+        self.min_size_rule = {}
+        self.min_enclosure_rule = {}
+        self.min_area_rule = {}
+
+        for idx, layer in enumerate(metal):
+            self.min_width_rule[layer] = width
+            self.min_spacing_rule[(layer,layer)] = spacing
+            self.min_area_rule[layer] = 0.025e-12
+
+            # vias below and above the layer
+            for v in via[max(idx-1, 0):idx+1]:
+                self.min_enclosure_rule[(layer,v)] = 5e-9
+                self.min_enclosure_rule[(layer,v,"end")] = 30e-9
+
+        self.min_size_rule["contact"] = 60e-9
+        self.min_enclosure_rule[("poly","contact")] = 10e-9
+        self.min_enclosure_rule[("poly","contact","end")] = 20e-9
+        for v in via[1:]:
+            self.min_size_rule[v] = 70e-9
+
+
+class Box:
+    def __init__(self, layer: str, pt1: list, pt2: list) -> None:
+        self.layer = layer
+        self.x = [pt1[0], pt2[0]]
+        self.y = [pt1[1], pt2[1]]
+
+
+class Text:
+    def __init__(self, layer: str, pt: list, name: str) -> None:
+        self.layer = layer
+        self.x = pt[0]
+        self.y = pt[1]
+        self.name = name
+
+
+class Pin:
+    def __init__(self, net: str, layer: str, pt1: list, pt2: list) -> None:
+        self.net = net
+        self.layer = layer
+        self.pt1 = pt1
+        self.pt2 = pt2
+        self.grid = []
+
+
+class Port:
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.shape = {}
+
+
+class Group:
+    def __init__(self) -> None:
+        self.pin = []
+        self.shape = {}
+
+
+class Circuit:
+    def __init__(self, name: str="") -> None:
+        self.name = name
+        self.group = {}
+        self.port = {}
+
+
+def install() -> bool:
+    """
+    @brief      Register this module as Module.DB if the real database is not importable
+    @return     True if the stand-in is used
+    """
+    try:
+        import Module.DB
+        return False
+    except ImportError:
+        pass
+
+    db = sys.modules[__name__]
+    module = sys.modules.get("Module") or types.ModuleType("Module")
+    module.DB = db
+    sys.modules["Module"] = module
+    sys.modules["Module.DB"] = db
+    return True
@@ -0,0 +1,84 @@
+"""
+Parametrized synthetic device arrays for the routing benchmark.
+"""
+import math
+import random
+
+from stub_db import Box, Circuit, Group, Pin, Port
+
+
+def make_circuit(devices: int, nets: int, pins_per_net: int, seed: int=0, ports: int=0) -> Circuit:
+    """
+    @brief      Array of transistor-like devices with randomly connected pins
+    @param      devices       The number of devices
+    @param      nets          The number of nets
+    @param      pins_per_net  The number of pins of each net
+    @param      seed          The random seed of the pin assignment
+    @param      ports         The number of nets with a metal1 port on the left of the array
+    @return     The circuit
+
+    Each device has a diffusion box, a poly gate pin above the diffusion and two metal1
+    source/drain pins on the diffusion, so it has 3 pin slots. The slots are shuffled and
+    dealt to the nets; the slots left over have no pin.
+    """
+    if nets * pins_per_net > 3 * devices:
+        raise ValueError("{} nets of {} pins do not fit in {} devices (3 pins each)".format(nets, pins_per_net, devices))
+
+    u = 1e-9
+    dev_pitch_x = 1400
+    dev_pitch_y = 1600
+    cols = math.ceil(math.sqrt(devices))
+
+    # pin slots of all devices
+    slots = []
+    circuit = Circuit("synthetic_{}d_{}n_{}p".format(devices, nets, pins_per_net))
+    for d in range(devices):
+        ox = (d % cols) * dev_pitch_x
+        oy = (d // cols) * dev_pitch_y
+
+        group = Group()
+        group.shape["ndiffusion"] = [Box("ndiffusion", [(ox+200)*u, oy*u], [(ox+1000)*u, (oy+400)*u])]
+        circuit.group["M"+str(d)] = group
+
+        slots.append((group, "poly", [(ox+540)*u, (oy+600)*u], [(ox+660)*u, (oy+720)*u]))
+        slots.append((group, "metal1", [(ox+200)*u, (oy+100)*u], [(ox+270)*u, (oy+300)*u]))
+        slots.append((group, "metal1", [(ox+930)*u, (oy+100)*u], [(ox+1000)*u, (oy+300)*u]))
+
+    # deal the slots to the nets
+    random.Random(seed).shuffle(slots)
+    for n in range(nets):
+        for group, layer, pt1, pt2 in slots[n*pins_per_net:(n+1)*pins_per_net]:
+            group.pin.append(Pin("N"+str(n), layer, pt1, pt2))
+
+    # ports on the left of the array
+    for n in range(min(ports, nets)):
+        port = Port("N"+str(n))
+        y = n * dev_pitch_y
+        port.shape["metal1"] = [Box("metal1", [-600*u, (y+1000)*u], [-400*u, (y+1200)*u])]
+        circuit.port["N"+str(n)] = port
+
+    return circuit
+
+
+def make_symmetric_circuit(devices: int, axis: int=1000) -> Circuit:
+    """
+    @brief      Row of devices and its mirror image about a vertical axis
+    @param      devices  The number of devices on each side of the axis
+    @param      axis     The x-coordinate of the axis in nm
+    @return     The circuit, with the nets P/N (left pins of the left devices, right pins of the
+                mirrored devices) and GL/GR (gates) mirroring each other about the axis
+    """
+    u = 1e-9
+    dev_pitch_x = 1400
+
+    circuit = Circuit("symmetric_{}d_{}".format(devices, axis))
+    for d in range(devices):
+        for side, ox in [("L", axis - (d+1) * dev_pitch_x), ("R", axis + d * dev_pitch_x + 200)]:
+            group = Group()
+            group.shape["ndiffusion"] = [Box("ndiffusion", [(ox+200)*u, 0], [(ox+1000)*u, 400*u])]
+            group.pin.append(Pin("G"+side, "poly", [(ox+540)*u, 600*u], [(ox+660)*u, 720*u]))
+            group.pin.append(Pin("P" if side == "L" else side+str(d), "metal1", [(ox+200)*u, 100*u], [(ox+270)*u, 300*u]))
+            group.pin.append(Pin("N" if side == "R" else side+str(d), "metal1", [(ox+930)*u, 100*u], [(ox+1000)*u, 300*u]))
+            circuit.group[side+str(d)] = group
+
+    return circuit